@@ -1,8 +1,10 @@
-from flask import Flask, render_template, session, redirect, url_for, request, make_response, flash, jsonify
+from flask import Flask, render_template, session, redirect, url_for, request, make_response, flash, jsonify, g, Response, stream_with_context, send_from_directory, abort
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime
-from twilio.rest import Client
+from sqlalchemy.orm import selectinload, load_only, with_expression
+from datetime import datetime, timedelta
 import csv
+import io
+import zlib
 import os
 from werkzeug.utils import secure_filename
 from functools import wraps
@@ -11,14 +13,38 @@ import razorpay
 import hmac, hashlib
 import traceback
 import json
+import re
+import random
+import secrets
+import logging
+import sqlite3
+import mimetypes
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
 load_dotenv(override=True)
-from utils.image_utils import save_product_image
+from utils.image_utils import (
+    remove_image_files, image_files_exist, picture_tag,
+    stage_upload, process_staged_image, static_root, CONTENT_ADDRESSED_RE
+)
+from utils.cache import VersionedCache, VersionedKeyedCache, LRUCache
+from utils.pricing import make_line_key, parse_line_key, quote as price_quote
+from utils.search import (
+    FTS_SCHEMA, FTS_REBUILD, BM25_WEIGHTS, SUGGEST_BM25_WEIGHTS, SUGGEST_CANDIDATES,
+    match_expression
+)
+from utils.static_assets import StaticManifest, pick_encoding
+from utils.razorpay_client import build_razorpay_client, CircuitOpenError
+from utils.write_queue import GroupCommitWriter, WriteQueueFull, WriteTimeout
+from utils.db_routing import RoutingSession, replica_binds, replica_reads, read_replica, on_primary
 
 
 PAYMENT_CREATED = "CREATED"
 PAYMENT_PAID = "PAID"
 PAYMENT_FAILED = "FAILED"
+PAYMENT_REFUNDED = "REFUNDED"
 
 load_dotenv()
 
@@ -38,23 +64,98 @@ def allowed_file(filename):
 # razorpay config
 RAZORPAY_KEY_ID = os.environ.get("RAZORPAY_KEY_ID", "")
 RAZORPAY_KEY_SECRET = os.environ.get("RAZORPAY_KEY_SECRET", "")
+# Point at a local stub server for load tests
+RAZORPAY_BASE_URL = os.environ.get("RAZORPAY_BASE_URL", "")
+
+_razorpay_client = None
 
 def get_razorpay_client():
-    return razorpay.Client(auth=(RAZORPAY_KEY_ID, RAZORPAY_KEY_SECRET))
+    """Per-process Razorpay client; all requests share one pooled session."""
+    global _razorpay_client
+    if _razorpay_client is None:
+        _razorpay_client = build_razorpay_client(
+            RAZORPAY_KEY_ID,
+            RAZORPAY_KEY_SECRET,
+            base_url=RAZORPAY_BASE_URL or None,
+            connect_timeout=float(os.environ.get("RAZORPAY_CONNECT_TIMEOUT", "3.05")),
+            read_timeout=float(os.environ.get("RAZORPAY_READ_TIMEOUT", "10")),
+            pool_size=int(os.environ.get("RAZORPAY_POOL_SIZE", "10")),
+        )
+    return _razorpay_client
 
 # Admin auth config
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin")
 
 # --- DATABASE SETUP ---
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(basedir, "store.db")
+app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv(
+    "DATABASE_URL", "sqlite:///" + os.path.join(basedir, "store.db")
+)
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-db = SQLAlchemy(app)
+# Connection pool settings, shared by the primary and any replicas
+DB_ENGINE_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "0") == "1",
+}
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = DB_ENGINE_OPTIONS
+
+# Optional read replicas for catalog pages, comma separated. Any SQLAlchemy
+# URL works: a Postgres replica, or a SQLite copy kept fresh by
+# snapshot_replica.py for trying this out locally.
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+app.config["SQLALCHEMY_BINDS"] = replica_binds(DATABASE_REPLICA_URLS, DB_ENGINE_OPTIONS)
+
+# Tables whose reads may come from a (slightly stale) replica. Carts, orders
+# and everything written by shoppers stay on the primary. So does
+# cache_version: the version-stamped caches below read both the stamp and
+# their data from the primary (on_primary), so a replica that has not caught
+# up yet can never get its rows cached under the new version.
+RoutingSession.replica_tables = frozenset({
+    "product", "product_image", "product_variant", "category",
+    "home_layout", "product_co_purchase",
+})
+
+# SQLite tuning, applied to every new connection.
+# WAL lets readers run alongside the single writer; busy_timeout makes a
+# writer wait for the lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),  # negative = KiB
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "temp_store": "MEMORY",
+}
+
+@event.listens_for(Engine, "connect")
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+db = SQLAlchemy(app, session_options={"class_": RoutingSession})
 
 from flask_migrate import Migrate
 migrate = Migrate(app, db)
 
+def lock_for_write():
+    """Make the session's current transaction hold the database write lock.
+
+    On SQLite that is BEGIN IMMEDIATE, so what the transaction reads next
+    cannot change under it before it writes. A transaction that has already
+    written holds the lock and is left alone. Call it before the first read
+    the writes depend on.
+    """
+    conn = db.session.connection()
+    if conn.dialect.name == "sqlite" and not conn.connection.driver_connection.in_transaction:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False, unique=True)
@@ -64,11 +165,16 @@ class Category(db.Model):
     def __repr__(self):
         return f"<Category {self.name}>"
 
-# ---- Twilio SMS Config (local dev only) ----
-account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-auth_token = os.getenv("TWILIO_AUTH_TOKEN")           
-client = Client(account_sid, auth_token)
+class CacheVersion(db.Model):
+    """Version stamps shared by all workers so in-process caches can be invalidated."""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
 
+class HomeLayout(db.Model):
+    """Precomputed home page sections, rebuilt by admin writes."""
+    id = db.Column(db.Integer, primary_key=True)
+    payload = db.Column(db.Text, nullable=False)  # JSON: bestseller ids + top product ids per category
+    built_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 # --- MODELS ---
 class Product(db.Model):
@@ -82,44 +188,86 @@ class Product(db.Model):
     
     # NEW FIELDS
     is_new_launch = db.Column(db.Boolean, default=False)
-    new_launch_date = db.Column(db.DateTime, nullable=True)
+    new_launch_date = db.Column(db.DateTime, nullable=True, index=True)
     sale_price = db.Column(db.Integer, nullable=True)  # If set, product is on sale
 
+    # Filled by shop listings with the first few characters of description
+    description_preview = db.query_expression()
+
+    __table_args__ = (
+        db.Index("ix_product_category_new_launch_id", "category", "is_new_launch", "id"),
+        db.Index("ix_product_new_launch_id", "is_new_launch", "id"),
+    )
+
     images = db.relationship(
         "ProductImage",
         back_populates="product",
         cascade="all, delete-orphan",
-        passive_deletes=True
+        passive_deletes=True,
+        order_by="ProductImage.order_index"
     )
 
-def cleanup_old_new_launches():
-    """Automatically remove 'New Launch' badge from products older than 7 days"""
-    from datetime import timedelta
-    
-    seven_days_ago = datetime.utcnow() - timedelta(days=7)
-    
-    old_launches = Product.query.filter(
-        Product.is_new_launch == True,
-        Product.new_launch_date != None,
-        Product.new_launch_date < seven_days_ago
-    ).all()
-    
-    for product in old_launches:
-        product.is_new_launch = False
-        product.new_launch_date = None
-    
-    if old_launches:
+    @property
+    def main_image(self):
+        """The loaded ProductImage behind image_url, if there is one."""
+        for image in self.images:
+            if image.image_url == self.image_url:
+                return image
+        return None
+
+    @property
+    def new_launch_active(self):
+        """'New Launch' badge state, expired at read time so listings never write."""
+        if not self.is_new_launch:
+            return False
+        return self.new_launch_date is None or self.new_launch_date >= new_launch_cutoff()
+
+NEW_LAUNCH_DAYS = 7
+
+def new_launch_cutoff():
+    return datetime.utcnow() - timedelta(days=NEW_LAUNCH_DAYS)
+
+def cleanup_old_new_launches(batch_size=500):
+    """Clear expired 'New Launch' flags in batches.
+
+    Run from cleanup_new_launches.py on a schedule; listings already hide the
+    badge at read time, this only keeps the stored flag (used for ordering) tidy.
+    """
+    cutoff = new_launch_cutoff()
+    removed = 0
+
+    while True:
+        ids = [row.id for row in db.session.query(Product.id).filter(
+            Product.is_new_launch == True,
+            Product.new_launch_date != None,
+            Product.new_launch_date < cutoff
+        ).limit(batch_size)]
+        if not ids:
+            break
+
+        Product.query.filter(Product.id.in_(ids)).update(
+            {Product.is_new_launch: False, Product.new_launch_date: None},
+            synchronize_session=False
+        )
+        # Listing order changed; lets catalog caches and API ETags move on
+        bump_cache_version("catalog")
         db.session.commit()
-        print(f"✓ Removed 'New Launch' from {len(old_launches)} products")
-    
-    return len(old_launches)
+        removed += len(ids)
+
+    return removed
 
 
 class ProductImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    image_url = db.Column(db.String(255), nullable=False)
+    image_url = db.Column(db.String(255), nullable=False, index=True)  # shared by duplicate uploads
     order_index = db.Column(db.Integer, default=0)  # For image ordering
 
+    # Responsive derivatives written at upload (see utils/image_utils.generate_derivatives)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    derivatives = db.Column(db.Text)  # JSON: {"jpeg": [[w, path]], "webp": [[w, path]], "placeholder": data-uri}
+    status = db.Column(db.String(20), default="ready")  # ready / processing / failed
+
     product_id = db.Column(
         db.Integer,
         db.ForeignKey("product.id", ondelete="CASCADE"),
@@ -131,6 +279,125 @@ class ProductImage(db.Model):
         back_populates="images"
     )
 
+    @property
+    def derivative_data(self):
+        if not self.derivatives:
+            return None
+        return {"width": self.width, "height": self.height, "derivatives": json.loads(self.derivatives)}
+
+def image_in_use(image_url):
+    """Reference count check: does any gallery row or product still point at this file?"""
+    return db.session.query(
+        ProductImage.query.filter_by(image_url=image_url).exists()
+    ).scalar() or db.session.query(
+        Product.query.filter_by(image_url=image_url).exists()
+    ).scalar()
+
+def release_image_files(image_url, derivatives=None):
+    """Delete a stored image's files once nothing references it (call after commit).
+
+    The reference check and the delete run under the write lock, the same
+    lock finish_product_image() holds while it checks the files a new
+    reference points at, so the two can never interleave.
+    """
+    if not image_url:
+        return
+    lock_for_write()
+    try:
+        if not image_in_use(image_url):
+            remove_image_files(image_url, derivatives)
+    finally:
+        db.session.commit()
+
+
+# ------------ IMAGE PROCESSING ------------
+# Uploads are staged as-is and converted in a process pool after the request
+# commits. Until then the ProductImage (and product.image_url, for the first
+# image) points at the staged file and status is "processing".
+
+IMAGE_READY = "ready"
+IMAGE_PROCESSING = "processing"
+IMAGE_FAILED = "failed"
+
+# 0 processes images inline (tests / single-process dev)
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_image_pool = None
+
+def get_image_pool():
+    global _image_pool
+    if _image_pool is None:
+        _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS)
+    return _image_pool
+
+def queue_product_image(product_id, file, order_index):
+    """Stage an upload and add its ProductImage in "processing" state."""
+    image = ProductImage(
+        product_id=product_id,
+        image_url=stage_upload(file),
+        order_index=order_index,
+        status=IMAGE_PROCESSING
+    )
+    db.session.add(image)
+    return image
+
+def submit_image_processing(images):
+    """Hand committed "processing" images to the pool (or process them inline)."""
+    root = static_root()
+    for image in images:
+        image_id, staged = image.id, image.image_url
+        if IMAGE_WORKERS <= 0:
+            try:
+                finish_product_image(image_id, staged, result=process_staged_image(root, staged))
+            except Exception as e:
+                finish_product_image(image_id, staged, error=e)
+            continue
+
+        future = get_image_pool().submit(process_staged_image, root, staged)
+        future.add_done_callback(
+            lambda f, image_id=image_id, staged=staged: finish_product_image(
+                image_id, staged,
+                result=None if f.exception() else f.result(),
+                error=f.exception()
+            )
+        )
+
+def finish_product_image(image_id, staged_url, result=None, error=None):
+    """Store the outcome of processing one staged image."""
+    with app.app_context():
+        lock_for_write()
+        image = db.session.get(ProductImage, image_id)
+        if image is None:
+            # Deleted while processing; drop what the worker produced unless shared
+            if result:
+                release_image_files(result["image_url"], result["derivatives"])
+            return
+
+        if error is not None:
+            app.logger.error("Image processing failed for %s: %s", staged_url, error)
+            image.status = IMAGE_FAILED
+            db.session.commit()
+            return
+
+        if not image_files_exist(result["image_url"], result["derivatives"]):
+            # The worker reused files of an identical image whose last
+            # reference was deleted meanwhile; release_image_files() won
+            app.logger.error("Image files for %s were removed while processing", staged_url)
+            image.status = IMAGE_FAILED
+            db.session.commit()
+            return
+
+        product = image.product
+        if product.image_url == staged_url:
+            product.image_url = result["image_url"]
+        image.image_url = result["image_url"]
+        image.width = result["width"]
+        image.height = result["height"]
+        image.derivatives = json.dumps(result["derivatives"])
+        image.status = IMAGE_READY
+        bump_cache_version("catalog")
+        db.session.commit()
+
 class ProductVariant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     product_id = db.Column(db.Integer, db.ForeignKey("product.id", ondelete="CASCADE"), nullable=False)
@@ -142,6 +409,10 @@ class ProductVariant(db.Model):
     
     product = db.relationship("Product", backref="variants")
 
+    __table_args__ = (
+        db.Index("ix_product_variant_product_type", "product_id", "variant_type"),
+    )
+
 class GiftWrap(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_item_id = db.Column(db.Integer, db.ForeignKey("order_item.id"), nullable=False)
@@ -160,21 +431,34 @@ class Order(db.Model):
     pincode = db.Column(db.String(20))
     notes = db.Column(db.Text)
     total_amount = db.Column(db.Integer, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     status = db.Column(db.String(30), default="Pending")
     payment_status = db.Column(db.String(30), default="Unpaid")
-    razorpay_order_id = db.Column(db.String(120), nullable=True)
-    razorpay_payment_id = db.Column(db.String(120), nullable=True)
+    razorpay_order_id = db.Column(db.String(120), nullable=True, index=True)
+    razorpay_payment_id = db.Column(db.String(120), nullable=True, index=True)
     razorpay_signature = db.Column(db.String(300), nullable=True)
+    # Total units, written at checkout so order lists never load items
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    # Rupees refunded so far (refund webhooks)
+    refunded_amount = db.Column(db.Integer, nullable=False, default=0)
 
     items = db.relationship("OrderItem", backref="order", lazy=True)
 
+    # Admin order list: filtered by status/payment, newest first; search by
+    # phone or name prefix (NOCASE so the LIKE prefix match can use it)
+    __table_args__ = (
+        db.Index("ix_order_status_created", "status", "created_at"),
+        db.Index("ix_order_payment_status_created", "payment_status", "created_at"),
+        db.Index("ix_order_phone", "phone"),
+        db.Index("ix_order_customer_name_nocase", db.text("customer_name COLLATE NOCASE")),
+    )
+
     def __repr__(self):
         return f"<Order #{self.id} {self.status} {self.payment_status}>"
     
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     product_name = db.Column(db.String(120), nullable=False)
     unit_price = db.Column(db.Integer, nullable=False)
@@ -184,35 +468,1139 @@ class OrderItem(db.Model):
         return f"<OrderItem {self.product_name} x{self.quantity}>"
 
 
+# ------------ CATALOG QUERIES ------------
+
+def catalog_query(with_variants=False):
+    """Product query that batch-loads images (and optionally variants).
+
+    Listing templates read product.images for every card, so the images for
+    the whole result are fetched in one extra SELECT instead of one per product.
+    """
+    options = [selectinload(Product.images)]
+    if with_variants:
+        options.append(selectinload(Product.variants))
+    return Product.query.options(*options)
+
+
+SHOP_PAGE_SIZE = 24
+
+def parse_shop_cursor(value):
+    """Cursor is "<is_new_launch>.<id>" of the last product on the previous page."""
+    try:
+        new_flag, last_id = value.split(".")
+        return int(new_flag), int(last_id)
+    except (AttributeError, ValueError):
+        return None
+
+def card_query():
+    """Product query loading just what _shop_product_card.html shows."""
+    return Product.query.options(
+        load_only(
+            Product.id, Product.name, Product.price, Product.sale_price,
+            Product.image_url, Product.is_bestseller, Product.is_new_launch,
+            Product.new_launch_date
+        ),
+        with_expression(Product.description_preview, db.func.substr(Product.description, 1, 51)),
+        selectinload(Product.images).load_only(
+            ProductImage.image_url, ProductImage.order_index, ProductImage.width,
+            ProductImage.height, ProductImage.derivatives
+        ),
+    )
+
+def shop_page(category=None, after=None, limit=SHOP_PAGE_SIZE):
+    """One keyset page of the shop listing, ordered new launches first, newest first.
+
+    Only the columns a product card shows are loaded; description is cut down
+    in SQL. Returns (products, next_cursor) where next_cursor is None on the
+    last page.
+    """
+    query = card_query()
+    if category:
+        query = query.filter(Product.category == category)
+
+    # Ordered on the stored flag so the walk stays on the (category,)
+    # is_new_launch, id indexes; expired launches move down once
+    # cleanup_new_launches.py clears the flag (the badge hides them before that)
+    cursor = parse_shop_cursor(after)
+    if cursor:
+        new_flag, last_id = cursor
+        # Row-value comparison, so SQLite seeks the index instead of OR-ing two scans
+        query = query.filter(db.tuple_(Product.is_new_launch, Product.id) < (bool(new_flag), last_id))
+
+    products = query.order_by(Product.is_new_launch.desc(), Product.id.desc())\
+        .limit(limit + 1).all()
+
+    next_cursor = None
+    if len(products) > limit:
+        products = products[:limit]
+        last = products[-1]
+        next_cursor = f"{int(bool(last.is_new_launch))}.{last.id}"
+    return products, next_cursor
+
+
+# ------------ SEARCH ------------
+# product_fts / product_suggest_fts (utils/search.py) are kept in sync by
+# SQLite triggers, so the admin routes need no search-specific code.
+
+SEARCH_PAGE_SIZE = 24
+SUGGEST_LIMIT = 8
+
+def ensure_search_index():
+    """Create the FTS tables and triggers if missing; index existing products on first creation."""
+    with db.engine.begin() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'product_suggest_fts'")
+        ).first()
+        for statement in FTS_SCHEMA:
+            conn.execute(text(statement))
+        if not exists:
+            for statement in FTS_REBUILD:
+                conn.execute(text(statement))
+
+def _bm25(table, weights):
+    return "bm25(%s, %s)" % (table, ", ".join(str(w) for w in weights))
+
+_BM25 = _bm25("product_fts", BM25_WEIGHTS)
+_SUGGEST_BM25 = _bm25("product_suggest_fts", SUGGEST_BM25_WEIGHTS)
+
+def search_product_ids(query_text, limit=SEARCH_PAGE_SIZE, offset=0):
+    """Product ids matching the text, best BM25 match first."""
+    expr = match_expression(query_text)
+    if not expr:
+        return []
+    rows = db.session.execute(
+        text(f"SELECT rowid FROM product_fts WHERE product_fts MATCH :q "
+             f"ORDER BY {_BM25} LIMIT :limit OFFSET :offset"),
+        {"q": expr, "limit": limit, "offset": offset},
+    )
+    return [r[0] for r in rows]
+
+def search_page(query_text, page=1, limit=SEARCH_PAGE_SIZE):
+    """One page of search results as card-ready products; (products, has_more)."""
+    ids = search_product_ids(query_text, limit + 1, (page - 1) * limit)
+    has_more = len(ids) > limit
+    ids = ids[:limit]
+    if not ids:
+        return [], False
+    by_id = {p.id: p for p in card_query().filter(Product.id.in_(ids)).all()}
+    return [by_id[pid] for pid in ids if pid in by_id], has_more
+
+def suggest_products(query_text, limit=SUGGEST_LIMIT):
+    """Typeahead rows (id, name, category, price, sale_price) matched on name/category prefixes.
+
+    Only the first SUGGEST_CANDIDATES matches are ranked, keeping short
+    prefixes as cheap as long ones.
+    """
+    expr = match_expression(query_text)
+    if not expr:
+        return []
+    return db.session.execute(
+        text(f"SELECT p.id, p.name, p.category, p.price, p.sale_price FROM ("
+             f"  SELECT rowid, {_SUGGEST_BM25} AS score FROM product_suggest_fts"
+             f"  WHERE product_suggest_fts MATCH :q LIMIT :candidates"
+             f") AS hit JOIN product p ON p.id = hit.rowid "
+             f"ORDER BY hit.score LIMIT :limit"),
+        {"q": expr, "candidates": SUGGEST_CANDIDATES, "limit": limit},
+    ).all()
+
+
+# ------------ CACHES ------------
+
+def get_cache_version(name):
+    row = db.session.get(CacheVersion, name)
+    return row.version if row else 0
+
+def invalidate_after_commit(*caches):
+    """Drop in-process caches once the current transaction commits.
+
+    Clearing them earlier would let a concurrent request refill them with
+    rows read before the commit.
+    """
+    db.session.info.setdefault("invalidate_caches", set()).update(caches)
+
+@event.listens_for(RoutingSession, "after_commit")
+def _invalidate_committed_caches(session):
+    for cache in session.info.pop("invalidate_caches", ()):
+        cache.invalidate()
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_cache_invalidations(session):
+    session.info.pop("invalidate_caches", None)
+
+def bump_cache_version(name):
+    """Bump a cache version inside the caller's transaction (commit is up to the caller)."""
+    updated = CacheVersion.query.filter_by(name=name).update(
+        {CacheVersion.version: CacheVersion.version + 1}
+    )
+    if not updated:
+        db.session.add(CacheVersion(name=name, version=1))
+
+def _load_category_names():
+    return [c.name for c in Category.query.order_by(Category.order_index).all()]
+
+category_cache = VersionedCache(
+    on_primary(_load_category_names),
+    lambda: get_cache_version("categories")
+)
+
+def get_category_names():
+    """Ordered category names, served from the in-process cache."""
+    return category_cache.get()
+
+HOME_CATEGORY_LIMIT = 4
+
+def compute_home_layout():
+    """Bestseller ids plus the first HOME_CATEGORY_LIMIT product ids of each category."""
+    rows = db.session.query(Product.id, Product.category, Product.is_bestseller)\
+        .order_by(Product.id).all()
+
+    bestsellers = [r.id for r in rows if r.is_bestseller]
+    by_category = {}
+    for r in rows:
+        ids = by_category.setdefault(r.category, [])
+        if len(ids) < HOME_CATEGORY_LIMIT:
+            ids.append(r.id)
+
+    sections = [
+        [name, by_category[name]]
+        for name in _load_category_names()
+        if by_category.get(name)
+    ]
+    return {"bestsellers": bestsellers, "categories": sections}
+
+def rebuild_home_layout():
+    """Store a fresh home layout in the caller's transaction."""
+    payload = json.dumps(compute_home_layout())
+    layout = db.session.get(HomeLayout, 1)
+    if layout is None:
+        layout = HomeLayout(id=1)
+        db.session.add(layout)
+    layout.payload = payload
+    layout.built_at = datetime.utcnow()
+    bump_cache_version("home")
+    invalidate_after_commit(home_layout_cache)
+
+def _load_home_layout():
+    layout = db.session.get(HomeLayout, 1)
+    if layout is None:
+        return compute_home_layout()
+    return json.loads(layout.payload)
+
+home_layout_cache = VersionedCache(
+    on_primary(_load_home_layout),
+    lambda: get_cache_version("home")
+)
+
+def _load_catalog_index():
+    """All product ids plus each product's category, for suggestion sampling."""
+    rows = db.session.query(Product.id, Product.category).order_by(Product.id).all()
+    by_category = {}
+    for r in rows:
+        by_category.setdefault(r.category, []).append(r.id)
+    return {
+        "ids": [r.id for r in rows],
+        "category": {r.id: r.category for r in rows},
+        "by_category": by_category,
+    }
+
+catalog_index_cache = VersionedCache(
+    on_primary(_load_catalog_index),
+    lambda: get_cache_version("catalog")
+)
+
+def _variant_entry(variant):
+    entry = {"id": variant.id, "name": variant.name}
+    if variant.variant_type == "color":
+        entry["code"] = variant.code
+    entry["priceAdj"] = variant.price_adjustment
+    entry["images"] = json.loads(variant.image_indices) if variant.image_indices else []
+    return entry
+
+def _load_variant_payload(product_id):
+    """Color/size variant JSON for the product page, from a single query."""
+    variants = ProductVariant.query.filter_by(product_id=product_id).order_by(ProductVariant.id).all()
+    colors = [_variant_entry(v) for v in variants if v.variant_type == "color"]
+    sizes = [_variant_entry(v) for v in variants if v.variant_type == "size"]
+    return {
+        "colors_json": json.dumps(colors),
+        "sizes_json": json.dumps(sizes),
+        "color_count": len(colors),
+        "size_count": len(sizes),
+    }
+
+variant_payload_cache = VersionedKeyedCache(
+    on_primary(_load_variant_payload),
+    lambda: get_cache_version("catalog")
+)
+
+def catalog_changed(categories=False):
+    """Call before committing any admin write to products or categories."""
+    if categories:
+        bump_cache_version("categories")
+        invalidate_after_commit(category_cache)
+    bump_cache_version("catalog")
+    invalidate_after_commit(catalog_index_cache, variant_payload_cache, api_cache)
+    rebuild_home_layout()
+
+
+# ------------ CO-PURCHASE RECOMMENDATIONS ------------
+# "Frequently bought together" counts, one row per ordered product pair.
+# Paid orders add to it as they arrive (mark_order_paid); the product page
+# reads the top rows for one product straight off ix_product_co_purchase_rank,
+# which matches its WHERE + ORDER BY so no sort step is needed.
+
+CO_PURCHASE_MAX_ITEMS = 20
+
+class ProductCoPurchase(db.Model):
+    __tablename__ = "product_co_purchase"
+
+    product_id = db.Column(db.Integer, primary_key=True)
+    other_id = db.Column(db.Integer, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index("ix_product_co_purchase_rank", product_id, count.desc(), other_id),
+    )
+
+def record_co_purchases(product_ids):
+    """Add one co-occurrence for every pair of distinct products, in the caller's transaction."""
+    ids = sorted(set(product_ids))[:CO_PURCHASE_MAX_ITEMS]
+    rows = [
+        {"product_id": a, "other_id": b, "count": 1}
+        for a in ids for b in ids if a != b
+    ]
+    if not rows:
+        return
+    stmt = sqlite_insert(ProductCoPurchase)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["product_id", "other_id"],
+        set_={"count": ProductCoPurchase.count + 1},
+    )
+    db.session.execute(stmt, rows)
+
+def co_purchased_ids(product_id, limit):
+    rows = db.session.query(ProductCoPurchase.other_id)\
+        .filter(ProductCoPurchase.product_id == product_id)\
+        .order_by(ProductCoPurchase.count.desc(), ProductCoPurchase.other_id)\
+        .limit(limit).all()
+    return [r.other_id for r in rows]
+
+def order_item_rows(order):
+    return db.session.query(OrderItem.product_id, OrderItem.quantity, OrderItem.unit_price)\
+        .filter_by(order_id=order.id).all()
+
+def mark_order_paid(order, payment_id, signature=None):
+    """Flip an order to PAID exactly once; feeds the co-purchase index and sales rollups."""
+    # A late capture event must not resurrect a refunded order either
+    if order.payment_status in (PAYMENT_PAID, PAYMENT_REFUNDED):
+        return False
+    order.payment_status = PAYMENT_PAID
+    order.razorpay_payment_id = payment_id
+    if signature is not None:
+        order.razorpay_signature = signature
+
+    items = order_item_rows(order)
+    record_co_purchases(item.product_id for item in items)
+    rollup_order_paid(order, items)
+    # Refund events can arrive before the capture they refund
+    apply_order_refunds(order)
+    return True
+
+
+# ------------ SALES ROLLUPS ------------
+# Per-day counters for the dashboard, bumped in the same transaction as the
+# order write. Orders count on the day they were placed; paid orders,
+# revenue and units also land on the order's day, whenever payment arrives.
+# rebuild_sales_rollups.py recomputes both tables from the orders.
+
+class DailySales(db.Model):
+    __tablename__ = "daily_sales"
+
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    paid_orders = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyProductSales(db.Model):
+    __tablename__ = "daily_product_sales"
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Integer, nullable=False, default=0)
+
+def _bump_rollup(model, keys, rows):
+    """Add each row's counters onto existing rollup rows, inserting missing ones."""
+    if not rows:
+        return
+    stmt = sqlite_insert(model)
+    counters = [name for name in rows[0] if name not in keys]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: getattr(model, name) + getattr(stmt.excluded, name) for name in counters},
+    )
+    db.session.execute(stmt, rows)
+
+def _order_day(order):
+    return (order.created_at or datetime.utcnow()).date()
+
+def rollup_order_created(order):
+    """Count a new order; call after flush, before commit."""
+    _bump_rollup(DailySales, ["day"], [{"day": _order_day(order), "orders": 1, "paid_orders": 0, "revenue": 0}])
+
+def rollup_order_paid(order, items):
+    """Add a paid order's revenue and units."""
+    day = _order_day(order)
+    _bump_rollup(DailySales, ["day"], [{
+        "day": day, "orders": 0, "paid_orders": 1, "revenue": order.total_amount or 0,
+    }])
+    _rollup_product_sales(day, items, 1)
+
+def rollup_order_refunded(order, amount, items=None):
+    """Take a refund off the order day's revenue.
+
+    Pass `items` for the refund that completes a full refund: the order then
+    stops counting as paid and its units come off the product rollups.
+    """
+    day = _order_day(order)
+    _bump_rollup(DailySales, ["day"], [{
+        "day": day, "orders": 0, "paid_orders": -1 if items is not None else 0, "revenue": -amount,
+    }])
+    if items is not None:
+        _rollup_product_sales(day, items, -1)
+
+def _rollup_product_sales(day, items, sign):
+    per_product = {}
+    for item in items:
+        units, revenue = per_product.get(item.product_id, (0, 0))
+        per_product[item.product_id] = (units + item.quantity, revenue + item.quantity * item.unit_price)
+    _bump_rollup(DailyProductSales, ["day", "product_id"], [
+        {"day": day, "product_id": pid, "units": sign * units, "revenue": sign * revenue}
+        for pid, (units, revenue) in per_product.items()
+    ])
+
+def sales_by_day(days):
+    """DailySales for the last `days` days, oldest first, with empty days filled in."""
+    today = datetime.utcnow().date()
+    start = today - timedelta(days=days - 1)
+    rows = {r.day: r for r in DailySales.query.filter(DailySales.day >= start).all()}
+    return [
+        rows.get(day) or DailySales(day=day, orders=0, paid_orders=0, revenue=0)
+        for day in (start + timedelta(days=n) for n in range(days))
+    ]
+
+def top_products(days, limit=5):
+    """(product_id, name, units, revenue) best sellers over the last `days` days."""
+    start = datetime.utcnow().date() - timedelta(days=days - 1)
+    units = db.func.sum(DailyProductSales.units)
+    rows = db.session.query(
+            DailyProductSales.product_id, units.label("units"),
+            db.func.sum(DailyProductSales.revenue).label("revenue"),
+        )\
+        .filter(DailyProductSales.day >= start)\
+        .group_by(DailyProductSales.product_id)\
+        .order_by(units.desc())\
+        .limit(limit).all()
+    names = dict(
+        db.session.query(Product.id, Product.name).filter(Product.id.in_([r.product_id for r in rows]))
+    )
+    return [
+        (r.product_id, names.get(r.product_id, f"Product #{r.product_id}"), r.units, r.revenue)
+        for r in rows
+    ]
+
+
+# ------------ NOTIFICATION OUTBOX ------------
+# Order SMS are written to notification_outbox in the order's transaction
+# and sent by notification_worker.py, so checkout never waits on Twilio.
+
+NOTIFY_PENDING = "PENDING"
+NOTIFY_SENDING = "SENDING"
+NOTIFY_SENT = "SENT"
+NOTIFY_FAILED = "FAILED"
+
+NOTIFY_MAX_ATTEMPTS = 6
+NOTIFY_BACKOFF_SECONDS = 30
+NOTIFY_MAX_BACKOFF_SECONDS = 3600
+NOTIFY_STALE_CLAIM_SECONDS = 300
+
+class NotificationOutbox(db.Model):
+    __tablename__ = "notification_outbox"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dedupe_key = db.Column(db.String(120), nullable=False, unique=True)
+    channel = db.Column(db.String(20), nullable=False, default="sms")
+    recipient = db.Column(db.String(40))
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=NOTIFY_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_notification_outbox_status_next", "status", "next_attempt_at"),
+    )
+
+def enqueue_order_notification(order):
+    """Add the admin "new order" SMS to the outbox; commit is up to the caller."""
+    dedupe_key = f"order:{order.id}:admin_sms"
+    if NotificationOutbox.query.filter_by(dedupe_key=dedupe_key).first():
+        return
+
+    db.session.add(NotificationOutbox(
+        dedupe_key=dedupe_key,
+        channel="sms",
+        recipient=os.getenv("ADMIN_PHONE_NUMBER"),
+        body=(
+            f"KCX Crochet order #{order.id} | ₹{order.total_amount} | "
+            f"{order.customer_name}, {order.phone}, {order.city or ''} {order.pincode or ''}"
+        ),
+    ))
+
+def process_notification_outbox(transport, batch_size=20):
+    """Send one batch of due notifications. Returns (sent, failed)."""
+    now = datetime.utcnow()
+
+    # Rows claimed by a worker that died mid-send go back to the queue
+    NotificationOutbox.query.filter(
+        NotificationOutbox.status == NOTIFY_SENDING,
+        NotificationOutbox.claimed_at < now - timedelta(seconds=NOTIFY_STALE_CLAIM_SECONDS)
+    ).update({NotificationOutbox.status: NOTIFY_PENDING}, synchronize_session=False)
+
+    due_ids = [row.id for row in db.session.query(NotificationOutbox.id).filter(
+        NotificationOutbox.status == NOTIFY_PENDING,
+        NotificationOutbox.next_attempt_at <= now
+    ).order_by(NotificationOutbox.id).limit(batch_size)]
+
+    # Claim rows one by one so two workers never send the same message
+    claimed = []
+    for row_id in due_ids:
+        updated = NotificationOutbox.query.filter_by(id=row_id, status=NOTIFY_PENDING).update(
+            {NotificationOutbox.status: NOTIFY_SENDING, NotificationOutbox.claimed_at: now},
+            synchronize_session=False
+        )
+        if updated:
+            claimed.append(row_id)
+    db.session.commit()
+
+    sent = failed = 0
+    for row in NotificationOutbox.query.filter(NotificationOutbox.id.in_(claimed)).all():
+        row.attempts += 1
+        try:
+            transport.send(row.recipient, row.body)
+        except Exception as e:
+            failed += 1
+            row.last_error = str(e)
+            if row.attempts >= NOTIFY_MAX_ATTEMPTS:
+                row.status = NOTIFY_FAILED
+            else:
+                delay = min(NOTIFY_BACKOFF_SECONDS * 2 ** (row.attempts - 1), NOTIFY_MAX_BACKOFF_SECONDS)
+                row.status = NOTIFY_PENDING
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+        else:
+            sent += 1
+            row.status = NOTIFY_SENT
+            row.sent_at = datetime.utcnow()
+            row.last_error = None
+        db.session.commit()
+
+    return sent, failed
+
+
+# ------------ RAZORPAY WEBHOOK EVENTS ------------
+# The webhook route only verifies the signature and stores the event, keyed
+# on Razorpay's event id so retries and duplicate deliveries collapse into
+# one row. webhook_worker.py applies stored events in batches;
+# replay_webhook_events.py requeues or imports events for backfills.
+
+WEBHOOK_PENDING = "PENDING"
+WEBHOOK_PROCESSING = "PROCESSING"
+WEBHOOK_DONE = "DONE"
+WEBHOOK_IGNORED = "IGNORED"
+WEBHOOK_FAILED = "FAILED"
+
+WEBHOOK_MAX_ATTEMPTS = 8
+WEBHOOK_BACKOFF_SECONDS = 15
+WEBHOOK_MAX_BACKOFF_SECONDS = 3600
+WEBHOOK_STALE_CLAIM_SECONDS = 300
+
+class WebhookEvent(db.Model):
+    __tablename__ = "webhook_event"
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(120), nullable=False, unique=True)
+    event_type = db.Column(db.String(60), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=WEBHOOK_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    processed_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index("ix_webhook_event_status_next", "status", "next_attempt_at"),
+    )
+
+class OrderRefund(db.Model):
+    """One row per Razorpay refund, so replayed refund events are no-ops."""
+    __tablename__ = "order_refund"
+
+    id = db.Column(db.Integer, primary_key=True)
+    refund_id = db.Column(db.String(120), nullable=False, unique=True)
+    order_id = db.Column(db.Integer, db.ForeignKey("order.id"), nullable=False, index=True)
+    amount = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+def store_webhook_event(event_id, body):
+    """Insert a raw event unless it is already stored; commit is up to the caller.
+
+    Returns False for a duplicate delivery. Raises ValueError for a body
+    that is not a JSON event.
+    """
+    event = json.loads(body)
+    if not isinstance(event, dict) or not event.get("event"):
+        raise ValueError("not a webhook event")
+
+    now = datetime.utcnow()
+    result = db.session.execute(
+        sqlite_insert(WebhookEvent).values(
+            event_id=event_id,
+            event_type=event["event"],
+            payload=body if isinstance(body, str) else body.decode("utf-8"),
+            status=WEBHOOK_PENDING,
+            attempts=0,
+            next_attempt_at=now,
+            received_at=now,
+        ).on_conflict_do_nothing(index_elements=["event_id"])
+    )
+    return result.rowcount > 0
+
+def _webhook_entity(event, name):
+    return ((event.get("payload") or {}).get(name) or {}).get("entity") or {}
+
+def _order_for_razorpay_id(r_order_id):
+    if not r_order_id:
+        return None
+    return Order.query.filter_by(razorpay_order_id=r_order_id).first()
+
+def _on_payment_captured(event):
+    payment = _webhook_entity(event, "payment")
+    order = _order_for_razorpay_id(payment.get("order_id"))
+    if not order or not payment.get("id"):
+        return False
+    return mark_order_paid(order, payment["id"])
+
+def _on_order_paid(event):
+    r_order = _webhook_entity(event, "order")
+    payment = _webhook_entity(event, "payment")
+    order = _order_for_razorpay_id(r_order.get("id") or payment.get("order_id"))
+    if not order or not payment.get("id"):
+        return False
+    return mark_order_paid(order, payment["id"])
+
+def _on_payment_failed(event):
+    payment = _webhook_entity(event, "payment")
+    order = _order_for_razorpay_id(payment.get("order_id"))
+    # Failed attempts are normal before a successful retry; never downgrade
+    if not order or order.payment_status in (PAYMENT_PAID, PAYMENT_REFUNDED):
+        return False
+    order.payment_status = PAYMENT_FAILED
+    return True
+
+def apply_order_refunds(order, at_least=0):
+    """Bring a paid order's refunded_amount up to its OrderRefund rows.
+
+    `at_least` is a refunded total known from elsewhere (the payment's
+    cumulative figure). Returns True if anything changed.
+    """
+    already = order.refunded_amount or 0
+    recorded = db.session.query(db.func.sum(OrderRefund.amount)).filter_by(order_id=order.id).scalar() or 0
+    refunded = min(max(recorded, at_least), order.total_amount)
+    if refunded <= already:
+        return False
+
+    order.refunded_amount = refunded
+    full = refunded >= order.total_amount
+    if full:
+        order.payment_status = PAYMENT_REFUNDED
+    rollup_order_refunded(order, refunded - already, order_item_rows(order) if full else None)
+    return True
+
+def _on_refund_processed(event):
+    refund = _webhook_entity(event, "refund")
+    payment = _webhook_entity(event, "payment")
+
+    order = _order_for_razorpay_id(payment.get("order_id"))
+    if order is None and refund.get("payment_id"):
+        order = Order.query.filter_by(razorpay_payment_id=refund["payment_id"]).first()
+    if order is None or order.payment_status == PAYMENT_REFUNDED:
+        return False
+
+    if refund.get("id"):
+        db.session.execute(
+            sqlite_insert(OrderRefund).values(
+                refund_id=refund["id"], order_id=order.id,
+                amount=(refund.get("amount") or 0) // 100, created_at=datetime.utcnow(),
+            ).on_conflict_do_nothing(index_elements=["refund_id"])
+        )
+        at_least = 0
+    else:
+        at_least = (order.refunded_amount or 0) + (refund.get("amount") or 0) // 100
+
+    if order.payment_status != PAYMENT_PAID:
+        # Refund seen before the capture; mark_order_paid applies the stored row
+        return bool(refund.get("id"))
+    # The payment's cumulative figure also covers refunds whose events never arrived
+    return apply_order_refunds(order, max(at_least, (payment.get("amount_refunded") or 0) // 100))
+
+WEBHOOK_HANDLERS = {
+    "payment.captured": _on_payment_captured,
+    "order.paid": _on_order_paid,
+    "payment.failed": _on_payment_failed,
+    "refund.processed": _on_refund_processed,
+}
+
+def apply_webhook_event(row):
+    """Apply one stored event in the caller's transaction; returns the new status."""
+    handler = WEBHOOK_HANDLERS.get(row.event_type)
+    if handler is None:
+        return WEBHOOK_IGNORED
+    return WEBHOOK_DONE if handler(json.loads(row.payload)) else WEBHOOK_IGNORED
+
+def process_webhook_events(batch_size=50):
+    """Apply one batch of due webhook events in a single transaction. Returns (applied, failed)."""
+    now = datetime.utcnow()
+
+    # Rows claimed by a worker that died mid-batch go back to the queue
+    WebhookEvent.query.filter(
+        WebhookEvent.status == WEBHOOK_PROCESSING,
+        WebhookEvent.claimed_at < now - timedelta(seconds=WEBHOOK_STALE_CLAIM_SECONDS)
+    ).update({WebhookEvent.status: WEBHOOK_PENDING}, synchronize_session=False)
+
+    due_ids = [row.id for row in db.session.query(WebhookEvent.id).filter(
+        WebhookEvent.status == WEBHOOK_PENDING,
+        WebhookEvent.next_attempt_at <= now
+    ).order_by(WebhookEvent.id).limit(batch_size)]
+
+    claimed = []
+    for row_id in due_ids:
+        updated = WebhookEvent.query.filter_by(id=row_id, status=WEBHOOK_PENDING).update(
+            {WebhookEvent.status: WEBHOOK_PROCESSING, WebhookEvent.claimed_at: now},
+            synchronize_session=False
+        )
+        if updated:
+            claimed.append(row_id)
+    db.session.commit()
+
+    # Received order, so e.g. a capture is applied before its refund
+    rows = WebhookEvent.query.filter(WebhookEvent.id.in_(claimed)).order_by(WebhookEvent.id).all()
+    for row in rows:
+        try:
+            status = apply_webhook_event(row)
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error("Webhook event %s failed: %s", row.event_id, e)
+
+            # The rollback also undid the events applied before this one, so every
+            # other claimed event goes straight back to the queue
+            WebhookEvent.query.filter(WebhookEvent.id.in_(claimed)).filter(
+                WebhookEvent.id != row.id
+            ).update({WebhookEvent.status: WEBHOOK_PENDING}, synchronize_session=False)
+
+            row = db.session.get(WebhookEvent, row.id)
+            row.attempts += 1
+            row.last_error = str(e)
+            if row.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                row.status = WEBHOOK_FAILED
+            else:
+                delay = min(WEBHOOK_BACKOFF_SECONDS * 2 ** (row.attempts - 1), WEBHOOK_MAX_BACKOFF_SECONDS)
+                row.status = WEBHOOK_PENDING
+                row.next_attempt_at = datetime.utcnow() + timedelta(seconds=delay)
+            db.session.commit()
+            return 0, 1
+
+        row.attempts += 1
+        row.status = status
+        row.processed_at = datetime.utcnow()
+        row.last_error = None
+
+    db.session.commit()
+    return len(rows), 0
+
+
+# ------------ ORDER WRITE QUEUE ------------
+
+# Optional single writer for order/payment writes. Checkouts, payment
+# callbacks, webhooks and admin status changes are handed to one thread that
+# commits them in groups, so a sale burst becomes a few larger transactions
+# instead of many small ones racing for the SQLite write lock.
+# It only coordinates writers inside this process: turn it on for a single
+# (threaded) server process, not a pool of forked workers.
+ORDER_WRITE_QUEUE = os.getenv("ORDER_WRITE_QUEUE", "0") == "1"
+WRITE_QUEUE_TIMEOUT = float(os.getenv("WRITE_QUEUE_TIMEOUT", "10"))
+
+def _apply_write_batch(jobs):
+    """Run queued write jobs in one transaction, each under its own savepoint.
+
+    A job that raises only rolls back its own savepoint; the rest of the
+    batch still commits together.
+    """
+    results = []
+    with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            # Take the write lock up front rather than upgrading mid-batch
+            db.session.execute(text("BEGIN IMMEDIATE"))
+        for job in jobs:
+            try:
+                with db.session.begin_nested():
+                    results.append((True, job()))
+            except Exception as exc:
+                results.append((False, exc))
+        db.session.commit()
+    return results
+
+order_writer = GroupCommitWriter(
+    _apply_write_batch,
+    max_batch=int(os.getenv("WRITE_QUEUE_MAX_BATCH", "32")),
+    max_delay=float(os.getenv("WRITE_QUEUE_MAX_DELAY_MS", "0")) / 1000,
+    max_pending=int(os.getenv("WRITE_QUEUE_MAX_PENDING", "256")),
+) if ORDER_WRITE_QUEUE else None
+
+def run_write(job):
+    """Run `job()` and commit it, through the write queue when it is enabled.
+
+    With the queue the job runs on the writer thread in its own session, so
+    it must load what it changes by id and return plain values, not ORM
+    objects. Raises WriteQueueFull / WriteTimeout under overload.
+    """
+    if order_writer is None:
+        result = job()
+        db.session.commit()
+        return result
+    return order_writer.submit(job, timeout=WRITE_QUEUE_TIMEOUT)
+
+@app.errorhandler(WriteQueueFull)
+@app.errorhandler(WriteTimeout)
+def write_queue_busy(error):
+    response = jsonify({"error": "busy", "detail": "Too many orders right now, please retry."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "2"
+    return response
+
+
+# ------------ TEMPLATE HELPERS ------------
+
+@app.template_global()
+def responsive_image(image, sizes="100vw", placeholder=True, **attrs):
+    """<picture> with WebP/JPEG srcsets for a ProductImage; plain <img> for a bare path."""
+    if isinstance(image, ProductImage):
+        return picture_tag(image.image_url, image.derivative_data, sizes, attrs, placeholder)
+    return picture_tag(image, None, sizes, attrs)
+
+
+# ------------ STATIC FILES ------------
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# Written by build_static_assets.py; empty until the first build
+static_manifest = StaticManifest(app.static_folder)
+
+@app.url_defaults
+def fingerprint_static_url(endpoint, values):
+    """Point url_for('static', ...) at the fingerprinted build copy when there is one."""
+    if endpoint == "static" and "filename" in values:
+        values["filename"] = static_manifest.url_path(values["filename"])
+
+
+def _immutable(response):
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def serve_static(filename):
+    """
+    Flask's static view, plus immutable caching for names that embed a hash:
+    content-addressed product images and fingerprinted build assets.
+    """
+    match = CONTENT_ADDRESSED_RE.match(filename)
+    if match:
+        # The name is the content hash, so it doubles as a strong ETag
+        etag = "-".join(part for part in (match["hash"], match["width"], match["ext"]) if part)
+        return _immutable(send_from_directory(app.static_folder, filename, etag=etag, max_age=IMMUTABLE_MAX_AGE))
+
+    asset = static_manifest.asset(filename)
+    if not asset:
+        return app.send_static_file(filename)
+
+    # Range requests (video seeking) always get the identity bytes;
+    # send_from_directory answers those with 206 Partial Content
+    chosen = None if request.range else pick_encoding(asset, request.accept_encodings)
+    if chosen is None:
+        response = send_from_directory(app.static_folder, filename, etag=asset["hash"], max_age=IMMUTABLE_MAX_AGE)
+    else:
+        encoding, suffix = chosen
+        response = send_from_directory(
+            app.static_folder, filename + suffix,
+            mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream",
+            etag=f"{asset['hash']}-{encoding}",
+            max_age=IMMUTABLE_MAX_AGE,
+        )
+        response.content_encoding = encoding
+
+    if asset["encodings"]:
+        response.vary.add("Accept-Encoding")
+    return _immutable(response)
+
+app.view_functions["static"] = serve_static
+
+
+# ------------ CART STORE ------------
+# Carts live in the cart table; the browser only holds an opaque random id
+# in CART_COOKIE. Display reads go through a per-process LRU (entries trusted
+# for CART_CACHE_SECONDS); checkout always reads the row itself. Writes
+# re-read and update the row under the write lock, so concurrent changes
+# from any process are applied one after another and none is lost. Carts
+# untouched for CART_EXPIRY_DAYS are removed by cleanup_carts.py.
+
+CART_COOKIE = "kcx_cart"
+CART_EXPIRY_DAYS = 30
+CART_ID_RE = re.compile(r"^[A-Za-z0-9_-]{32}$")
+
+class Cart(db.Model):
+    __tablename__ = "cart"
+
+    id = db.Column(db.String(64), primary_key=True)
+    items = db.Column(db.Text, nullable=False, default="{}")  # {"<product id>": qty}
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+cart_cache = LRUCache(
+    maxsize=int(os.getenv("CART_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("CART_CACHE_SECONDS", "5")),
+)
+
+def _cart_id():
+    """Cart id from the cookie, or None until the first item is added."""
+    if "cart_id" not in g:
+        cart_id = request.cookies.get(CART_COOKIE)
+        g.cart_id = cart_id if cart_id and CART_ID_RE.match(cart_id) else None
+    return g.cart_id
+
+def _read_cart_row(cart_id):
+    items = db.session.execute(db.select(Cart.items).where(Cart.id == cart_id)).scalar()
+    return json.loads(items) if items else {}
+
+def _write_cart(mutate):
+    """Apply mutate(items) to the stored cart and commit; creates the cart on first use.
+
+    The read and the write happen in one transaction holding the write lock,
+    so a concurrent change to the same cart is never overwritten.
+    """
+    cart_id = _cart_id()
+    if cart_id is None:
+        cart_id = g.cart_id = secrets.token_urlsafe(24)
+
+    lock_for_write()
+    items = _read_cart_row(cart_id)
+    mutate(items)
+
+    now = datetime.utcnow()
+    payload = json.dumps(items)
+    db.session.execute(
+        sqlite_insert(Cart).values(id=cart_id, items=payload, created_at=now, updated_at=now)
+        .on_conflict_do_update(index_elements=["id"], set_={"items": payload, "updated_at": now})
+    )
+    db.session.commit()
+
+    cart_cache.set(cart_id, items)
+    g.pop("cart_summary", None)
+    g.refresh_cart_cookie = True
+    return items
+
+def _merge_session_cart():
+    """Move a cart from the old cookie session into the store (once per browser)."""
+    legacy = session.pop("cart", None) if "cart" in session else None
+    if not legacy:
+        return
+
+    def merge(items):
+        for pid, qty in legacy.items():
+            if str(pid).isdigit() and isinstance(qty, int) and qty > 0:
+                items[str(pid)] = items.get(str(pid), 0) + qty
+    _write_cart(merge)
+
+def get_cart(fresh=False):
+    """Current cart as a {line key: qty} dict (a copy; change it with update_cart).
+
+    `fresh` skips the per-process cache, which another worker's write may
+    have made stale; anything that places an order must use it.
+    """
+    _merge_session_cart()
+    cart_id = _cart_id()
+    if cart_id is None:
+        return {}
+
+    items = None if fresh else cart_cache.get(cart_id)
+    if items is None:
+        items = _read_cart_row(cart_id)
+        cart_cache.set(cart_id, items)
+    return dict(items)
+
+def update_cart(mutate):
+    """Change the cart in place via mutate(items) and persist it."""
+    _merge_session_cart()
+    return _write_cart(mutate)
+
+def clear_cart(ordered):
+    """Take the ordered {line key: qty} out of the cart.
+
+    Anything added after the order was quoted (from another tab or worker)
+    stays in the cart.
+    """
+    if _cart_id() is None:
+        return
+
+    def remove_ordered(items):
+        for key, quantity in ordered.items():
+            left = items.get(key, 0) - quantity
+            if left > 0:
+                items[key] = left
+            else:
+                items.pop(key, None)
+    _write_cart(remove_ordered)
+
+def purge_abandoned_carts(days=CART_EXPIRY_DAYS, batch_size=500):
+    """Delete carts not updated for `days` days, in batches. Returns the number removed."""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    removed = 0
+    while True:
+        ids = [row.id for row in db.session.query(Cart.id)
+               .filter(Cart.updated_at < cutoff).limit(batch_size)]
+        if not ids:
+            return removed
+        Cart.query.filter(Cart.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        removed += len(ids)
+
+@app.after_request
+def set_cart_cookie(response):
+    # Re-sent on every cart change, so the cookie lives as long as the cart row
+    if g.get("refresh_cart_cookie"):
+        response.set_cookie(
+            CART_COOKIE, g.cart_id,
+            max_age=CART_EXPIRY_DAYS * 24 * 3600,
+            httponly=True, samesite="Lax", secure=request.is_secure,
+        )
+    return response
+
+
 # ------------ CART HELPERS ------------
 
-def get_cart():
-    """Return the cart dict from session, create if missing."""
-    if "cart" not in session:
-        session["cart"] = {}
-    return session["cart"]
-
-def build_cart():
-    """Convert session cart (id -> qty) to list of products, total and count."""
-    cart = session.get("cart", {})
-    items = []
-    total = 0
-    count = 0
-
-    for product_id, qty in cart.items():
-        product = Product.query.get(int(product_id))
-        if product:
-            # Use sale price if available, otherwise regular price
-            effective_price = product.sale_price if product.sale_price else product.price
-            items.append({"product": product, "quantity": qty})
-            total += effective_price * qty
-            count += qty
-
-    return items, total, count
+def quote_cart(gift_wraps=None, with_description=False, fresh=False, with_images=False):
+    """Price the current cart (see utils/pricing.py) from one product fetch.
+
+    Products come back in one IN query loading only the columns the cart
+    shows; variants are fetched in a second one only when a line has any,
+    images (for responsive thumbnails) only with `with_images`.
+    Pass `fresh` when the quote becomes an order (see get_cart).
+    """
+    cart = get_cart(fresh=fresh)
+    parsed = [parse_line_key(key) for key in cart]
+    product_ids = {p[0] for p in parsed if p}
+    variant_ids = {v for p in parsed if p for v in p[1]}
+
+    columns = [Product.id, Product.name, Product.price, Product.sale_price, Product.image_url]
+    if with_description:
+        columns.append(Product.description)
+
+    products = variants = {}
+    if product_ids:
+        options = [load_only(*columns)]
+        if with_images:
+            options.append(selectinload(Product.images).load_only(
+                ProductImage.image_url, ProductImage.order_index, ProductImage.width,
+                ProductImage.height, ProductImage.derivatives
+            ))
+        products = {
+            p.id: p for p in Product.query.options(*options)
+            .filter(Product.id.in_(product_ids)).all()
+        }
+    if variant_ids:
+        variants = {
+            v.id: v for v in ProductVariant.query.filter(ProductVariant.id.in_(variant_ids)).all()
+        }
+    return price_quote(cart, products, variants, gift_wraps)
+
+def build_cart(with_description=False):
+    """Cart lines, subtotal and item count for templates.
+
+    Memoized on `g` for the rest of the request, so the context processor
+    and the view share one lookup.
+    """
+    cached = g.get("cart_summary")
+    if cached and (cached["with_description"] or not with_description):
+        return cached["result"]
+
+    quote = quote_cart(with_description=with_description, with_images=True)
+    result = (quote["lines"], quote["subtotal"], quote["count"])
+    g.cart_summary = {"with_description": with_description, "result": result}
+    return result
+
+def parse_gift_wraps(raw):
+    """Gift wrap choices posted by checkout as JSON {line key: {"type": ...}}."""
+    try:
+        wraps = json.loads(raw or "{}")
+    except ValueError:
+        return {}
+    return wraps if isinstance(wraps, dict) else {}
+
+def place_order(quote, **fields):
+    """Create the order, its items and gift wraps for a quote; commit is up to the caller.
+
+    Items go in as one multi-row INSERT ... RETURNING, wraps as another, so
+    the statement count does not grow with the number of lines.
+    """
+    order = Order(total_amount=quote["total"], item_count=quote["count"], **fields)
+    db.session.add(order)
+    db.session.flush()
+
+    lines = quote["lines"]
+    item_ids = db.session.scalars(
+        db.insert(OrderItem).returning(OrderItem.id, sort_by_parameter_order=True),
+        [
+            {
+                "order_id": order.id,
+                "product_id": line["product"].id,
+                "product_name": line["name"],
+                "unit_price": line["unit_price"],
+                "quantity": line["quantity"],
+            }
+            for line in lines
+        ],
+    ).all()
+
+    wraps = [
+        {"order_item_id": item_id, "wrap_type": line["wrap"], "wrap_price": line["wrap_price"]}
+        for item_id, line in zip(item_ids, lines) if line["wrap"]
+    ]
+    if wraps:
+        db.session.execute(db.insert(GiftWrap), wraps)
+
+    enqueue_order_notification(order)
+    rollup_order_created(order)
+    return order
 
 @app.context_processor
 def inject_cart():
-    items, total, count = build_cart()
+    # The cart row itself is not a replica table, so it stays read-your-writes
+    with replica_reads(db):
+        items, total, count = build_cart()
     open_flag = session.pop("open_cart", False)
 
     return dict(
@@ -220,112 +1608,317 @@ def inject_cart():
         cart_total_global=total,
         cart_count_global=count,
         cart_open_global=open_flag,
-        categories_global=[c.name for c in Category.query.order_by(Category.order_index).all()]
+        categories_global=get_category_names()
     )
 
 
 # ------------ ROUTES ------------
 
 @app.route("/")
+@read_replica(db)
 def home():
-    cleanup_old_new_launches()
-    bestsellers = Product.query.filter_by(is_bestseller=True).all()
+    layout = home_layout_cache.get()
+
+    # One fetch for every product referenced by the precomputed layout
+    product_ids = set(layout["bestsellers"])
+    for _, ids in layout["categories"]:
+        product_ids.update(ids)
+    products_by_id = {}
+    if product_ids:
+        products_by_id = {
+            p.id: p for p in catalog_query().filter(Product.id.in_(product_ids)).all()
+        }
+
+    bestsellers = [products_by_id[i] for i in layout["bestsellers"] if i in products_by_id]
     
     # Get products by category for home page
     category_products = {}
-    for category in Category.query.order_by(Category.order_index).all():
-        products = Product.query.filter_by(category=category.name).limit(4).all()
+    for name, ids in layout["categories"]:
+        products = [products_by_id[i] for i in ids if i in products_by_id]
         if products:
-            category_products[category.name] = products
+            category_products[name] = products
     
     return render_template("home.html", products=bestsellers, category_products=category_products)
 
 
 @app.route("/shop")
+@read_replica(db)
 def shop():
     category = request.args.get('category')
+    if category not in get_category_names():
+        category = None
+
+    products, next_cursor = shop_page(category, request.args.get("after"))
     
-    if category and Category.query.filter_by(name=category).first():
-        products = Product.query.filter_by(category=category)\
-            .order_by(Product.is_new_launch.desc(), Product.id.desc()).all()
-    else:
-        products = Product.query\
-            .order_by(Product.is_new_launch.desc(), Product.id.desc()).all()
-    
-    return render_template("shop.html", products=products, selected_category=category)
+    return render_template(
+        "shop.html",
+        products=products,
+        selected_category=category,
+        next_page_url=url_for("shop", category=category, after=next_cursor) if next_cursor else None,
+        next_json_url=url_for("shop_page_json", category=category, after=next_cursor) if next_cursor else None
+    )
+
+def card_image_url(product):
+    """Same main image the product cards show, as a static URL."""
+    image = product.image_url or (product.images[0].image_url if product.images else None)
+    return url_for("static", filename=image) if image else None
+
+@app.route("/shop/page")
+@read_replica(db)
+def shop_page_json():
+    """Next shop page for infinite scroll: rendered cards plus card data."""
+    category = request.args.get('category')
+    if category not in get_category_names():
+        category = None
+
+    products, next_cursor = shop_page(category, request.args.get("after"))
+
+    html = "".join(
+        render_template("_shop_product_card.html", product=p) for p in products
+    )
+    return jsonify({
+        "products": [
+            {
+                "id": p.id,
+                "name": p.name,
+                "price": p.price,
+                "sale_price": p.sale_price,
+                "image_url": card_image_url(p),
+                "is_bestseller": bool(p.is_bestseller),
+                "is_new_launch": p.new_launch_active,
+            }
+            for p in products
+        ],
+        "html": html,
+        "next_cursor": next_cursor,
+        "next_url": url_for("shop_page_json", category=category, after=next_cursor) if next_cursor else None,
+        "next_page_url": url_for("shop", category=category, after=next_cursor) if next_cursor else None,
+    })
+
+def parse_page_arg():
+    try:
+        return max(1, int(request.args.get("page", 1)))
+    except ValueError:
+        return 1
+
+@app.route("/search")
+def search():
+    query_text = request.args.get("q", "").strip()
+    page = parse_page_arg()
+    products, has_more = search_page(query_text, page)
+
+    return render_template(
+        "shop.html",
+        products=products,
+        selected_category=None,
+        search_query=query_text,
+        next_page_url=url_for("search", q=query_text, page=page + 1) if has_more else None,
+        next_json_url=url_for("search_page_json", q=query_text, page=page + 1) if has_more else None
+    )
+
+@app.route("/search/page")
+def search_page_json():
+    """Next page of search results for infinite scroll, same shape as /shop/page."""
+    query_text = request.args.get("q", "").strip()
+    page = parse_page_arg()
+    products, has_more = search_page(query_text, page)
+
+    html = "".join(
+        render_template("_shop_product_card.html", product=p) for p in products
+    )
+    return jsonify({
+        "html": html,
+        "next_url": url_for("search_page_json", q=query_text, page=page + 1) if has_more else None,
+        "next_page_url": url_for("search", q=query_text, page=page + 1) if has_more else None,
+    })
+
+@app.route("/search/suggest")
+def search_suggest():
+    """Typeahead: prefix matches on product name and category, best first."""
+    rows = suggest_products(request.args.get("q", ""))
+    return jsonify({
+        "results": [
+            {
+                "id": r.id,
+                "name": r.name,
+                "category": r.category,
+                "price": r.sale_price or r.price,
+                "url": url_for("product_detail", product_id=r.id),
+            }
+            for r in rows
+        ]
+    })
+
+SUGGESTION_COUNT = 4
+
+def suggested_product_ids(product_id, count=SUGGESTION_COUNT):
+    """Frequently-bought-together products first, then same category, then a random sample.
+
+    Apart from the co-purchase lookup this works on the cached id index,
+    so the random fill never sorts the product table.
+    """
+    index = catalog_index_cache.get()
+    category = index["category"].get(product_id)
+
+    # Skip ids of products deleted since the pair was recorded
+    picked = [pid for pid in co_purchased_ids(product_id, count) if pid in index["category"]]
+    if category and len(picked) < count:
+        seen = set(picked)
+        picked.extend(
+            pid for pid in index["by_category"].get(category, [])
+            if pid != product_id and pid not in seen
+        )
+        picked = picked[:count]
+
+    ids = index["ids"]
+    if len(picked) < count and ids:
+        exclude = set(picked)
+        exclude.add(product_id)
+        # Oversample a little so excluded ids rarely leave us short
+        sample = random.sample(ids, min(len(ids), count + len(exclude)))
+        picked.extend(pid for pid in sample if pid not in exclude)
+        picked = picked[:count]
+    return picked
 
 @app.route("/product/<int:product_id>")
+@read_replica(db)
 def product_detail(product_id):
-    product = Product.query.get_or_404(product_id)
-    
-    # GET VARIANTS FROM DATABASE
-    color_variants = ProductVariant.query.filter_by(
-        product_id=product_id, 
-        variant_type='color'
-    ).all()
-    
-    size_variants = ProductVariant.query.filter_by(
-        product_id=product_id, 
-        variant_type='size'
-    ).all()
-    
-    # Convert to JSON-friendly format
-    import json
-    colors_data = []
-    for cv in color_variants:
-        colors_data.append({
-            'id': cv.id,
-            'name': cv.name,
-            'code': cv.code,
-            'priceAdj': cv.price_adjustment,
-            'images': json.loads(cv.image_indices) if cv.image_indices else []
-        })
-    
-    sizes_data = []
-    for sv in size_variants:
-        sizes_data.append({
-            'id': sv.id,
-            'name': sv.name,
-            'priceAdj': sv.price_adjustment,
-            'images': json.loads(sv.image_indices) if sv.image_indices else []
-        })
-    
-    # DEBUGGING: Print to console
-    print(f"DEBUG - Product {product_id}:")
-    print(f"  Images in DB: {len(product.images)}")
-    print(f"  Color variants: {len(colors_data)}")
-    print(f"  Size variants: {len(sizes_data)}")
-    for cv in colors_data:
-        print(f"    Color '{cv['name']}' -> images: {cv['images']}")
-    for sv in sizes_data:
-        print(f"    Size '{sv['name']}' -> images: {sv['images']}")
-    
-    # Get suggested products
-    if product.category:
-        suggested = Product.query.filter(
-            Product.category == product.category,
-            Product.id != product_id
-        ).limit(4).all()
-        
-        if len(suggested) < 4:
-            additional = Product.query.filter(
-                Product.id != product_id
-            ).order_by(db.func.random()).limit(4 - len(suggested)).all()
-            suggested.extend(additional)
-    else:
-        suggested = Product.query.filter(
-            Product.id != product_id
-        ).order_by(db.func.random()).limit(4).all()
-    
+    suggested_ids = suggested_product_ids(product_id)
+
+    # The product and its suggestions come back in one IN query
+    products = {
+        p.id: p for p in catalog_query().filter(Product.id.in_([product_id, *suggested_ids])).all()
+    }
+    product = products.get(product_id)
+    if product is None:
+        abort(404)
+    suggested = [products[pid] for pid in suggested_ids if pid in products]
+
+    variants = variant_payload_cache.get(product_id)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug(
+            "Product %s: %d images, %d color variants, %d size variants",
+            product_id, len(product.images), variants["color_count"], variants["size_count"],
+        )
+
     return render_template(
         "product.html", 
         product=product, 
         suggested_products=suggested,
-        color_variants_json=json.dumps(colors_data),
-        size_variants_json=json.dumps(sizes_data)
+        color_variants_json=variants["colors_json"],
+        size_variants_json=variants["sizes_json"]
     )
 
 
+# ------------ CATALOG API ------------
+
+# JSON versions of the shop, product and category data for mobile clients
+# and edge caches. Bodies are built once per catalog version and kept with a
+# strong ETag (a hash of the exact bytes), so a revalidation with a matching
+# If-None-Match is answered 304 without touching the database.
+
+def _api_body(payload):
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return {"body": body, "etag": hashlib.sha256(body).hexdigest()[:32]}
+
+def _api_product(product, detail=False):
+    data = {
+        "id": product.id,
+        "name": product.name,
+        "price": product.price,
+        "sale_price": product.sale_price,
+        "image_url": card_image_url(product),
+        "is_bestseller": bool(product.is_bestseller),
+        "is_new_launch": product.new_launch_active,
+        "url": url_for("product_detail", product_id=product.id),
+    }
+    if detail:
+        variants = variant_payload_cache.get(product.id)
+        data.update({
+            "description": product.description,
+            "category": product.category,
+            "images": [url_for("static", filename=img.image_url) for img in product.images],
+            "colors": json.loads(variants["colors_json"]),
+            "sizes": json.loads(variants["sizes_json"]),
+        })
+    else:
+        data["description_preview"] = product.description_preview
+    return data
+
+def _load_api_response(key):
+    """Serialized body + ETag for one API resource, see api_cache."""
+    kind, *args = key
+    version = get_cache_version("catalog")
+
+    if kind == "products":
+        category, after = args
+        products, next_cursor = shop_page(category, after)
+        return _api_body({
+            "catalog_version": version,
+            "products": [_api_product(p) for p in products],
+            "next_cursor": next_cursor,
+            "next_url": url_for("api_products", category=category, after=next_cursor) if next_cursor else None,
+        })
+
+    if kind == "product":
+        product = catalog_query().filter(Product.id == args[0]).first()
+        if product is None:
+            return None
+        return _api_body({"catalog_version": version, "product": _api_product(product, detail=True)})
+
+    by_category = catalog_index_cache.get()["by_category"]
+    return _api_body({
+        "catalog_version": version,
+        "categories": [
+            {
+                "name": name,
+                "product_count": len(by_category.get(name, [])),
+                "url": url_for("api_products", category=name),
+            }
+            for name in get_category_names()
+        ],
+    })
+
+api_cache = VersionedKeyedCache(
+    on_primary(_load_api_response),
+    lambda: get_cache_version("catalog")
+)
+
+def api_response(key):
+    """Cached JSON response for `key` with a strong ETag; 304 when the client has it."""
+    entry = api_cache.get(key)
+    if entry is None:
+        return jsonify({"error": "not_found"}), 404
+
+    response = make_response(entry["body"])
+    response.mimetype = "application/json"
+    response.set_etag(entry["etag"])
+    # Shared caches may keep it but must revalidate; that costs a 304 at most
+    response.headers["Cache-Control"] = "public, no-cache"
+    return response.make_conditional(request)
+
+@app.route("/api/products")
+@read_replica(db)
+def api_products():
+    category = request.args.get("category")
+    if category not in get_category_names():
+        category = None
+    after = request.args.get("after")
+    if after is not None and parse_shop_cursor(after) is None:
+        return jsonify({"error": "invalid_cursor"}), 400
+    return api_response(("products", category, after))
+
+@app.route("/api/products/<int:product_id>")
+@read_replica(db)
+def api_product(product_id):
+    return api_response(("product", product_id))
+
+@app.route("/api/categories")
+@read_replica(db)
+def api_categories():
+    return api_response(("categories",))
+
+
 @app.route("/create_order", methods=["POST"])
 def create_order():
     data = request.get_json() or {}
@@ -354,13 +1947,16 @@ def create_order():
             "receipt": f"order_{order.id}",
             "payment_capture": 1
         })
+    except CircuitOpenError:
+        return jsonify({"error": "gateway_unavailable"}), 503
     except Exception as e:
         print("ERROR creating razorpay order:", type(e), e)
         traceback.print_exc()
         return jsonify({"error": "razorpay_error", "detail": str(e)}), 500
 
-    order.razorpay_order_id = razor_order.get("id")
-    db.session.commit()
+    def save_razorpay_order():
+        db.session.get(Order, order.id).razorpay_order_id = razor_order.get("id")
+    run_write(save_razorpay_order)
 
     return jsonify({
         "razorpay_order_id": razor_order.get("id"),
@@ -390,19 +1986,19 @@ def verify_payment():
     try:
         client.utility.verify_payment_signature(params)
     except razorpay.errors.SignatureVerificationError as e:
-        order = db.session.get(Order, local_order_id)
-        if order:
-            order.payment_status = PAYMENT_FAILED
-            db.session.commit()
+        def mark_failed():
+            order = db.session.get(Order, local_order_id)
+            # A bad signature must not undo a payment that already went through
+            if order and order.payment_status != PAYMENT_PAID:
+                order.payment_status = PAYMENT_FAILED
+        run_write(mark_failed)
         return jsonify({"status": "failure", "error": str(e)}), 400
 
-    order = db.session.get(Order, local_order_id)
-
-    if order and order.payment_status != PAYMENT_PAID:
-        order.payment_status = PAYMENT_PAID
-        order.razorpay_payment_id = r_payment_id
-        order.razorpay_signature = r_signature
-        db.session.commit()
+    def mark_paid():
+        order = db.session.get(Order, local_order_id)
+        if order:
+            mark_order_paid(order, r_payment_id, r_signature)
+    run_write(mark_paid)
 
     return jsonify({"status": "success"})
 
@@ -422,29 +2018,14 @@ def razorpay_webhook():
         if not hmac.compare_digest(computed, signature):
             return "invalid signature", 400
 
-    event = request.get_json()
-    etype = event.get("event")
-
-    if etype == "payment.captured":
-        payment = event.get("payload", {}).get("payment", {}).get("entity", {})
-        r_payment_id = payment.get("id")
-        r_order_id = payment.get("order_id")
-
-        if not r_payment_id or not r_order_id:
-            return jsonify({"ok": True})
-
-        local_order = Order.query.filter_by(razorpay_order_id=r_order_id).first()
-
-        if not local_order:
-            return jsonify({"ok": True})
-
-        if local_order.payment_status == PAYMENT_PAID:
-            return jsonify({"ok": True})
-
-        local_order.payment_status = PAYMENT_PAID
-        local_order.razorpay_payment_id = r_payment_id
-        db.session.commit()
+    # Razorpay retries with the same event id; fall back to the body hash
+    event_id = request.headers.get("X-Razorpay-Event-Id") or hashlib.sha256(body).hexdigest()
+    try:
+        run_write(lambda: store_webhook_event(event_id, body))
+    except ValueError:
+        return "invalid payload", 400
 
+    # Applied by webhook_worker.py; acknowledge as soon as the event is durable
     return jsonify({"ok": True})
 
 
@@ -487,20 +2068,28 @@ def admin_logout():
 @app.route("/admin/products")
 @admin_required
 def admin_products():
-    products = Product.query.order_by(Product.id.desc()).all()
+    products = catalog_query().order_by(Product.id.desc()).all()
     return render_template("admin_products.html", products=products)
 
+DASHBOARD_CHART_DAYS = 30
+
 @app.route("/admin")
 @admin_required
 def admin_index():
-    orders_count = Order.query.count()
+    # Everything order-related comes from the daily rollups, not the order table
+    orders_count = db.session.query(db.func.coalesce(db.func.sum(DailySales.orders), 0)).scalar()
     products_count = Product.query.count()
-    today = datetime.utcnow().date()
-    todays_count = Order.query.filter(db.func.date(Order.created_at) == today).count()
+    chart_days = sales_by_day(DASHBOARD_CHART_DAYS)
+    today = chart_days[-1]
     return render_template("admin_index.html",
                            orders_count=orders_count,
                            products_count=products_count,
-                           todays_count=todays_count)
+                           todays_count=today.orders,
+                           today=today,
+                           chart_days=chart_days,
+                           chart_max=max(d.revenue for d in chart_days) or 1,
+                           period_revenue=sum(d.revenue for d in chart_days),
+                           top_products=top_products(DASHBOARD_CHART_DAYS))
 
 
 @app.route("/admin/products/add", methods=["GET", "POST"])
@@ -532,20 +2121,15 @@ def admin_product_add():
         db.session.add(p)
         db.session.commit()
 
-        # Handle multiple images
+        # Handle multiple images (processed after the commit below)
+        queued_images = []
         files = request.files.getlist("images")
         for idx, file in enumerate(files):
             if file and file.filename:
-                image_url = save_product_image(file)
+                image = queue_product_image(p.id, file, idx)
                 if idx == 0:
-                    p.image_url = image_url
-                db.session.add(
-                    ProductImage(
-                        product_id=p.id,
-                        image_url=image_url,
-                        order_index=idx
-                    )
-                )
+                    p.image_url = image.image_url
+                queued_images.append(image)
 
         # Handle variants
         color_variants_json = request.form.get("color_variants", "[]")
@@ -580,14 +2164,18 @@ def admin_product_add():
         except:
             pass
 
+        catalog_changed()
         db.session.commit()
+        submit_image_processing(queued_images)
+        if queued_images:
+            return redirect(url_for("admin_product_edit", product_id=p.id))
         return redirect(url_for("admin_products"))
 
     # FOR GET REQUEST - adding new product (no existing variants)
     return render_template(
         "admin_product_form.html", 
         product=None, 
-        categories=[c.name for c in Category.query.order_by(Category.order_index).all()],
+        categories=get_category_names(),
         existing_color_variants=json.dumps([]),
         existing_size_variants=json.dumps([])
     )
@@ -633,22 +2221,17 @@ def admin_product_edit(product_id):
             except:
                 pass
 
-        # Handle new images
+        # Handle new images (processed after the commit below)
+        queued_images = []
         files = request.files.getlist("images")
         if files and files[0].filename:
             current_max_index = db.session.query(db.func.max(ProductImage.order_index)).filter_by(product_id=product.id).scalar() or -1
             for idx, file in enumerate(files):
                 if file and file.filename and allowed_file(file.filename):
-                    image_url = save_product_image(file)
+                    image = queue_product_image(product.id, file, current_max_index + idx + 1)
                     if not product.image_url:
-                        product.image_url = image_url
-                    db.session.add(
-                        ProductImage(
-                            product_id=product.id,
-                            image_url=image_url,
-                            order_index=current_max_index + idx + 1
-                        )
-                    )
+                        product.image_url = image.image_url
+                    queued_images.append(image)
 
         # Update variants
         ProductVariant.query.filter_by(product_id=product.id).delete()
@@ -685,7 +2268,11 @@ def admin_product_edit(product_id):
         except:
             pass
 
+        catalog_changed()
         db.session.commit()
+        submit_image_processing(queued_images)
+        if queued_images:
+            return redirect(url_for("admin_product_edit", product_id=product.id))
         return redirect(url_for("admin_products"))
 
     # FOR GET REQUEST - Load existing variants
@@ -714,34 +2301,98 @@ def admin_product_edit(product_id):
     return render_template(
         "admin_product_form.html", 
         product=product, 
-        categories=[c.name for c in Category.query.order_by(Category.order_index).all()],
+        categories=get_category_names(),
         existing_color_variants=json.dumps(existing_colors),
         existing_size_variants=json.dumps(existing_sizes)
     )
 
 
+@app.route("/admin/products/<int:product_id>/images/status")
+@admin_required
+def admin_product_images_status(product_id):
+    """Polled by the product form while uploads are processing."""
+    images = ProductImage.query.filter_by(product_id=product_id)\
+        .order_by(ProductImage.order_index).all()
+    return jsonify({
+        "processing": sum(1 for img in images if img.status == IMAGE_PROCESSING),
+        "images": [
+            {
+                "id": img.id,
+                "status": img.status or IMAGE_READY,
+                "url": url_for("static", filename=img.image_url),
+            }
+            for img in images
+        ]
+    })
+
+
 @app.route("/admin/products/delete/<int:product_id>", methods=["POST"])
 @admin_required
 def admin_product_delete(product_id):
     product = Product.query.get_or_404(product_id)
 
-    if product.image_url:
-        try:
-            path = os.path.join("static", product.image_url)
-            if os.path.exists(path):
-                os.remove(path)
-        except Exception:
-            pass
+    # Loading images here also makes the ORM cascade delete their rows
+    released = [(img.image_url, (img.derivative_data or {}).get("derivatives")) for img in product.images]
+    if product.image_url and not product.main_image:
+        released.append((product.image_url, None))
 
+    ProductCoPurchase.query.filter(
+        (ProductCoPurchase.product_id == product_id) | (ProductCoPurchase.other_id == product_id)
+    ).delete(synchronize_session=False)
     db.session.delete(product)
+    catalog_changed()
     db.session.commit()
+
+    for image_url, derivatives in released:
+        release_image_files(image_url, derivatives)
     return redirect(url_for("admin_products"))
 
+ADMIN_ORDERS_PAGE_SIZE = 50
+
+def parse_order_cursor(value):
+    """Cursor is "<created_at as %Y%m%d%H%M%S%f>.<id>" of the last order on the previous page."""
+    try:
+        stamp, last_id = value.split(".")
+        return datetime.strptime(stamp, "%Y%m%d%H%M%S%f"), int(last_id)
+    except (AttributeError, ValueError):
+        return None
+
 @app.route("/admin/orders")
 @admin_required
 def admin_orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return render_template("admin_orders.html", orders=orders)
+    # Dashboard shortcut
+    args = request.args.to_dict()
+    if args.pop("filter", None) == "today":
+        args["from"] = args["to"] = datetime.utcnow().strftime("%Y-%m-%d")
+        return redirect(url_for("admin_orders", **args))
+
+    query = apply_order_filters(Order.query.options(load_only(
+        Order.id, Order.created_at, Order.customer_name, Order.phone, Order.city,
+        Order.total_amount, Order.status, Order.payment_status, Order.item_count
+    )))
+
+    cursor = parse_order_cursor(request.args.get("after"))
+    if cursor:
+        query = query.filter(db.tuple_(Order.created_at, Order.id) < cursor)
+
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc())\
+        .limit(ADMIN_ORDERS_PAGE_SIZE + 1).all()
+
+    next_url = None
+    if len(orders) > ADMIN_ORDERS_PAGE_SIZE:
+        orders = orders[:ADMIN_ORDERS_PAGE_SIZE]
+        last = orders[-1]
+        args.pop("after", None)
+        next_url = url_for("admin_orders", after=f"{last.created_at:%Y%m%d%H%M%S%f}.{last.id}", **args)
+
+    filters = {key: request.args.get(key, "") for key in ("from", "to", "status", "payment_status", "q")}
+    return render_template(
+        "admin_orders.html",
+        orders=orders,
+        filters=filters,
+        is_first_page=cursor is None,
+        next_url=next_url,
+    )
 
 
 @app.route("/admin/orders/<int:order_id>")
@@ -755,11 +2406,14 @@ def admin_order_detail(order_id):
 @app.route("/admin/orders/<int:order_id>/set-status", methods=["POST"])
 @admin_required
 def admin_set_status(order_id):
-    order = Order.query.get_or_404(order_id)
     new_status = request.form.get("status")
     if new_status:
-        order.status = new_status
-        db.session.commit()
+        def set_status():
+            order = db.session.get(Order, order_id)
+            if order is None:
+                abort(404)
+            order.status = new_status
+        run_write(set_status)
     return redirect(url_for("admin_order_detail", order_id=order_id))
 
 @app.route("/admin/products/delete-image/<int:image_id>", methods=["POST"])
@@ -768,13 +2422,8 @@ def admin_delete_image(image_id):
     try:
         image = ProductImage.query.get_or_404(image_id)
         product = image.product
-        
-        try:
-            image_path = os.path.join("static", image.image_url)
-            if os.path.exists(image_path):
-                os.remove(image_path)
-        except Exception as e:
-            print(f"Error deleting image file: {e}")
+        image_url = image.image_url
+        derivatives = (image.derivative_data or {}).get("derivatives")
         
         if product.image_url == image.image_url:
             remaining_images = ProductImage.query.filter(
@@ -788,27 +2437,119 @@ def admin_delete_image(image_id):
                 product.image_url = None
         
         db.session.delete(image)
+        catalog_changed()
         db.session.commit()
+        release_image_files(image_url, derivatives)
         
         return jsonify({"success": True})
     except Exception as e:
         print(f"Error deleting image: {e}")
         return jsonify({"success": False, "error": str(e)}), 500
 
+def parse_date_arg(name):
+    """YYYY-MM-DD query arg as a datetime, or None if missing/invalid."""
+    value = request.args.get(name, "").strip()
+    try:
+        return datetime.strptime(value, "%Y-%m-%d") if value else None
+    except ValueError:
+        return None
+
+def _like_prefix(value):
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+def _prefix_range(column, prefix):
+    """Case-sensitive prefix match as a range, so a plain index on the column applies."""
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.and_(column >= prefix, column < upper)
+
+def apply_order_filters(stmt):
+    """Filters shared by the admin order list and the CSV export.
+
+    Query args: from / to (YYYY-MM-DD, inclusive), status, payment_status
+    and q: "#123" for an order id, a phone number prefix, or a name prefix.
+    """
+    date_from = parse_date_arg("from")
+    date_to = parse_date_arg("to")
+    if date_from:
+        stmt = stmt.where(Order.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Order.created_at < date_to + timedelta(days=1))
+    if request.args.get("status"):
+        stmt = stmt.where(Order.status == request.args["status"])
+    if request.args.get("payment_status"):
+        stmt = stmt.where(Order.payment_status == request.args["payment_status"])
+
+    q = request.args.get("q", "").strip()
+    if q.startswith("#") and q[1:].isdigit():
+        stmt = stmt.where(Order.id == int(q[1:]))
+    elif q and q.lstrip("+").replace(" ", "").isdigit():
+        stmt = stmt.where(_prefix_range(Order.phone, q.replace(" ", "")))
+    elif q:
+        stmt = stmt.where(Order.customer_name.like(_like_prefix(q), escape="\\"))
+    return stmt
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+
 @app.route("/admin/orders/export")
 @admin_required
 def admin_orders_export():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-
-    output = "Order ID,Created,Name,Phone,City,Total,Status,Payment Status\n"
-    for o in orders:
-        created = o.created_at.strftime("%Y-%m-%d %H:%M")
-        line = f'{o.id},"{created}","{o.customer_name}","{o.phone}","{o.city or ""}",{o.total_amount},{o.status or ""},{o.payment_status or ""}\n'
-        output += line
+    """Stream orders as CSV.
+
+    Query args: the apply_order_filters() ones, items=1 (one row per line
+    item) and gzip=1.
+    """
+    include_items = request.args.get("items") == "1"
+    use_gzip = request.args.get("gzip") == "1"
+
+    columns = [
+        Order.id, Order.created_at, Order.customer_name, Order.phone, Order.city,
+        Order.total_amount, Order.status, Order.payment_status
+    ]
+    header = ["Order ID", "Created", "Name", "Phone", "City", "Total", "Status", "Payment Status"]
+    if include_items:
+        columns += [OrderItem.product_id, OrderItem.product_name, OrderItem.unit_price, OrderItem.quantity]
+        header += ["Product ID", "Product", "Unit Price", "Quantity"]
+
+    stmt = db.select(*columns)
+    if include_items:
+        stmt = stmt.outerjoin(OrderItem, OrderItem.order_id == Order.id)
+
+    stmt = apply_order_filters(stmt).order_by(Order.created_at.desc(), Order.id.desc())
+    if include_items:
+        stmt = stmt.order_by(OrderItem.id)
+
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+
+        rows = db.session.execute(stmt.execution_options(yield_per=1000))
+        for row in rows:
+            row = list(row)
+            row[1] = row[1].strftime("%Y-%m-%d %H:%M") if row[1] else ""
+            writer.writerow(row)
+            if buffer.tell() >= EXPORT_CHUNK_SIZE:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def generate_gzip():
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        for chunk in generate_csv():
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+
+    if use_gzip:
+        body, filename, mimetype = generate_gzip(), "orders.csv.gz", "application/gzip"
+    else:
+        body, filename, mimetype = generate_csv(), "orders.csv", "text/csv"
 
-    response = make_response(output)
-    response.headers["Content-Disposition"] = "attachment; filename=orders.csv"
-    response.headers["Content-Type"] = "text/csv"
+    response = Response(stream_with_context(body), mimetype=mimetype)
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
     return response
 
 
@@ -816,47 +2557,49 @@ def admin_orders_export():
 
 @app.route("/add/<int:product_id>")
 def add_to_cart(product_id):
-    cart = get_cart()
-    cart[str(product_id)] = cart.get(str(product_id), 0) + 1
-    session["cart"] = cart
+    # ?variants=3,7 from the product page's color/size pickers
+    variant_ids = [v for v in request.args.get("variants", "").split(",") if v.isdigit()]
+    key = make_line_key(product_id, variant_ids)
+
+    def add(cart):
+        cart[key] = cart.get(key, 0) + 1
+    update_cart(add)
     session["open_cart"] = True
     return redirect(request.referrer or url_for("shop"))
 
 
-@app.route("/cart/increase/<int:product_id>")
-def increase_quantity(product_id):
-    cart = get_cart()
-    cart[str(product_id)] = cart.get(str(product_id), 0) + 1
-    session["cart"] = cart
+@app.route("/cart/increase/<key>")
+def increase_quantity(key):
+    def increase(cart):
+        if key in cart:
+            cart[key] += 1
+    update_cart(increase)
     session["open_cart"] = True
     return redirect(request.referrer or url_for("cart"))
 
 
-@app.route("/cart/decrease/<int:product_id>")
-def decrease_quantity(product_id):
-    cart = get_cart()
-    pid = str(product_id)
-    if pid in cart:
-        cart[pid] -= 1
-        if cart[pid] <= 0:
-            cart.pop(pid)
-    session["cart"] = cart
+@app.route("/cart/decrease/<key>")
+def decrease_quantity(key):
+    def decrease(cart):
+        if key in cart:
+            cart[key] -= 1
+            if cart[key] <= 0:
+                cart.pop(key)
+    update_cart(decrease)
     session["open_cart"] = True
     return redirect(request.referrer or url_for("cart"))
 
 
-@app.route("/cart/remove/<int:product_id>")
-def remove_from_cart(product_id):
-    cart = get_cart()
-    cart.pop(str(product_id), None)
-    session["cart"] = cart
+@app.route("/cart/remove/<key>")
+def remove_from_cart(key):
+    update_cart(lambda cart: cart.pop(key, None))
     session["open_cart"] = True
     return redirect(request.referrer or url_for("cart"))
 
 
 @app.route("/cart")
 def cart():
-    items, total, count = build_cart()
+    items, total, count = build_cart(with_description=True)
     return render_template("cart.html", cart_items=items, total=total)
 
 
@@ -867,145 +2610,51 @@ def order_success(order_id):
 
 @app.route("/checkout", methods=["GET", "POST"])
 def checkout():
-    items, total, count = build_cart()
-
-    if not items:
-        return redirect(url_for("shop"))
-
     if request.method == "POST":
-        customer_name = request.form.get("name")
-        phone = request.form.get("phone")
-        email = request.form.get("email")
-        address = request.form.get("address")
-        city = request.form.get("city")
-        pincode = request.form.get("pincode")
-        notes = request.form.get("notes")
-
-        order = Order(
-            customer_name=customer_name,
-            phone=phone,
-            email=email,
-            address=address,
-            city=city,
-            pincode=pincode,
-            notes=notes,
-            total_amount=total,
+        quote = quote_cart(parse_gift_wraps(request.form.get("gift_wraps")), fresh=True)
+        if not quote["lines"]:
+            return redirect(url_for("cart"))
+
+        fields = dict(
+            customer_name=request.form.get("name"),
+            phone=request.form.get("phone"),
+            email=request.form.get("email"),
+            address=request.form.get("address"),
+            city=request.form.get("city"),
+            pincode=request.form.get("pincode"),
+            notes=request.form.get("notes"),
         )
+        order_id = run_write(lambda: place_order(quote, **fields).id)
+        clear_cart({line["key"]: line["quantity"] for line in quote["lines"]})
 
-        db.session.add(order)
-        db.session.flush()
-
-        for item in items:
-            effective_price = item["product"].sale_price if item["product"].sale_price else item["product"].price
-            oi = OrderItem(
-                order_id=order.id,
-                product_id=item["product"].id,
-                product_name=item["product"].name,
-                unit_price=effective_price,
-                quantity=item["quantity"],
-            )
-            db.session.add(oi)
-
-        db.session.commit()
-        session["cart"] = {}
-
-        print(">>> ABOUT TO SEND SMS FOR ORDER", order.id)
-
-        try:
-            client = Client(account_sid, auth_token)
-            message_body = (
-                f"KCX Crochet order #{order.id} | ₹{total} | "
-                f"{customer_name}, {phone}, {city} {pincode}"
-            )
-
-            TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
-            ADMIN_PHONE_NUMBER = os.getenv("ADMIN_PHONE_NUMBER")
-
-            client.messages.create(
-                body=message_body,
-                from_=TWILIO_FROM_NUMBER,
-                to=ADMIN_PHONE_NUMBER,
-            )
-
-            print("SMS Sent Successfully!")
-
-        except Exception as e:
-            print("SMS FAILED:", e)
-
-        return redirect(url_for("order_success", order_id=order.id))
+        return redirect(url_for("order_success", order_id=order_id))
 
+    items, total, count = build_cart()
+    if not items:
+        return redirect(url_for("shop"))
     return render_template("checkout.html", cart_items=items, total=total, count=count)
 
 @app.route("/checkout_ajax", methods=["POST"])
 def checkout_ajax():
-    items, total, count = build_cart()
+    quote = quote_cart(parse_gift_wraps(request.form.get("gift_wraps")), fresh=True)
 
-    if not items:
+    if not quote["lines"]:
         return jsonify({"error": "cart_empty"}), 400
 
-    customer_name = request.form.get("name") or "Customer"
-    phone = request.form.get("phone") or ""
-    email = request.form.get("email") or ""
-    address = request.form.get("address") or ""
-    city = request.form.get("city") or ""
-    pincode = request.form.get("pincode") or ""
-    notes = request.form.get("notes") or ""
-    
-    # ADD THIS: Get gift wrap data
-    import json
-    gift_wraps_json = request.form.get("gift_wraps", "{}")
-    gift_wraps = {}
-    try:
-        gift_wraps = json.loads(gift_wraps_json)
-    except:
-        pass
-    
-    # Calculate total with gift wraps
-    wrap_total = sum(wrap.get('price', 0) for wrap in gift_wraps.values())
-    final_total = total + wrap_total
-
-    order = Order(
-        customer_name=customer_name,
-        phone=phone,
-        email=email,
-        address=address,
-        city=city,
-        pincode=pincode,
-        notes=notes,
-        total_amount=final_total,  # CHANGE: Use final_total instead of total
+    fields = dict(
+        customer_name=request.form.get("name") or "Customer",
+        phone=request.form.get("phone") or "",
+        email=request.form.get("email") or "",
+        address=request.form.get("address") or "",
+        city=request.form.get("city") or "",
+        pincode=request.form.get("pincode") or "",
+        notes=request.form.get("notes") or "",
         payment_status="Unpaid",
-        status="Pending"
+        status="Pending",
     )
-    db.session.add(order)
-    db.session.flush()
-
-    for it in items:
-        prod = it["product"]
-        qty = it["quantity"]
-        effective_price = prod.sale_price if prod.sale_price else prod.price
-        oi = OrderItem(
-            order_id=order.id,
-            product_id=prod.id,
-            product_name=prod.name,
-            unit_price=effective_price,
-            quantity=qty
-        )
-        db.session.add(oi)
-        db.session.flush()
-        
-        # ADD THIS: Handle gift wrap for this item
-        product_id_str = str(prod.id)
-        if product_id_str in gift_wraps:
-            wrap_data = gift_wraps[product_id_str]
-            db.session.add(GiftWrap(
-                order_item_id=oi.id,
-                wrap_type=wrap_data.get('type'),
-                wrap_price=wrap_data.get('price')
-            ))
+    order_id = run_write(lambda: place_order(quote, **fields).id)
 
-    db.session.commit()
-
-    return jsonify({"order_id": order.id, "total": final_total})  # CHANGE: Return final_total
+    return jsonify({"order_id": order_id, "total": quote["total"]})
 
 # ----- CATEGORY MANAGEMENT ROUTES -----
 
@@ -1025,6 +2674,7 @@ def admin_category_add():
             max_order = db.session.query(db.func.max(Category.order_index)).scalar() or -1
             category = Category(name=name, order_index=max_order + 1)
             db.session.add(category)
+            catalog_changed(categories=True)
             db.session.commit()
             flash(f"Category '{name}' added successfully!", "success")
         else:
@@ -1041,6 +2691,7 @@ def admin_category_delete(category_id):
         flash(f"Cannot delete '{category.name}' - {products_count} products are using it!", "danger")
     else:
         db.session.delete(category)
+        catalog_changed(categories=True)
         db.session.commit()
         flash(f"Category '{category.name}' deleted!", "success")
     return redirect(url_for("admin_categories"))
@@ -1054,6 +2705,7 @@ def admin_category_reorder():
         category = Category.query.get(int(cat_id))
         if category:
             category.order_index = idx
+    catalog_changed(categories=True)
     db.session.commit()
     return jsonify({"success": True})
 
@@ -1072,6 +2724,12 @@ with app.app_context():
             db.session.add(Category(name=cat_name, order_index=idx))
         db.session.commit()
         print("✓ Default categories initialized")
+
+    if db.session.get(HomeLayout, 1) is None:
+        rebuild_home_layout()
+        db.session.commit()
+
+    ensure_search_index()
     
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,65 @@
+"""
+Generate responsive derivatives (resized JPEG/WebP + placeholder) for
+product images that were uploaded before derivatives existed.
+
+- Every ProductImage without derivatives gets them
+- Products that only have image_url (e.g. from seed_db.py) get a
+  ProductImage row for it, so templates can use the derivatives
+
+    python backfill_image_derivatives.py
+    python backfill_image_derivatives.py --force   # regenerate everything
+"""
+
+import argparse
+import json
+
+from app import app, db, Product, ProductImage
+from utils.image_utils import generate_derivatives
+
+
+def backfill(force=False, batch_size=50):
+    done = failed = 0
+
+    # Products that predate the ProductImage gallery
+    for product in Product.query.filter(Product.image_url != None, ~Product.images.any()).all():
+        db.session.add(ProductImage(product_id=product.id, image_url=product.image_url, order_index=0))
+    db.session.commit()
+
+    query = ProductImage.query.order_by(ProductImage.id)
+    if not force:
+        query = query.filter(ProductImage.derivatives == None)
+
+    last_id = 0
+    while True:
+        batch = query.filter(ProductImage.id > last_id).limit(batch_size).all()
+        if not batch:
+            break
+
+        for image in batch:
+            last_id = image.id
+            try:
+                meta = generate_derivatives(image.image_url)
+            except (OSError, ValueError) as e:
+                failed += 1
+                print(f"✗ {image.image_url}: {e}")
+                continue
+            image.width = meta["width"]
+            image.height = meta["height"]
+            image.derivatives = json.dumps(meta["derivatives"])
+            done += 1
+
+        db.session.commit()
+        print(f"… {done} images processed")
+
+    return done, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    with app.app_context():
+        done, failed = backfill(force=args.force, batch_size=args.batch_size)
+    print(f"✓ Backfilled {done} images, {failed} failed")
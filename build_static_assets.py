@@ -0,0 +1,22 @@
+"""
+Fingerprint static files and precompress text assets, e.g. as a deploy step.
+
+    python build_static_assets.py
+
+- Copies go to static/dist/ with a content hash in the name; url_for('static', ...)
+  switches to them once the app (re)starts
+- CSS/JS/SVG etc. also get .br (when the brotli package is installed) and .gz
+  variants, served according to Accept-Encoding
+"""
+
+from app import app
+from utils.static_assets import build_static_assets, brotli
+
+
+if __name__ == "__main__":
+    manifest = build_static_assets(app.static_folder)
+    assets = manifest["assets"]
+    compressed = sum(1 for entry in assets.values() if entry["encodings"])
+    print(f"✓ Fingerprinted {len(assets)} static files, {compressed} precompressed")
+    if brotli is None:
+        print("  brotli not installed; only .gz variants were built")
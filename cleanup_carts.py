@@ -0,0 +1,37 @@
+"""
+Delete server-side carts nobody has touched for a while.
+
+Schedule it (cron / task scheduler), e.g. daily:
+
+    python cleanup_carts.py
+    python cleanup_carts.py --days 14
+    python cleanup_carts.py --loop 86400    # run as a simple worker
+"""
+
+import argparse
+import time
+
+from app import app, purge_abandoned_carts, CART_EXPIRY_DAYS
+
+
+def run_once(days, batch_size):
+    with app.app_context():
+        removed = purge_abandoned_carts(days=days, batch_size=batch_size)
+    if removed:
+        print(f"✓ Removed {removed} abandoned carts")
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=CART_EXPIRY_DAYS)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--loop", type=int, default=0, metavar="SECONDS",
+                        help="repeat every SECONDS instead of running once")
+    args = parser.parse_args()
+
+    while True:
+        run_once(args.days, args.batch_size)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
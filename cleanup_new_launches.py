@@ -0,0 +1,36 @@
+"""
+Remove expired 'New Launch' flags in batches.
+
+Listings hide the badge at read time, so this never has to run on a request.
+Schedule it (cron / task scheduler), e.g. hourly:
+
+    python cleanup_new_launches.py
+    python cleanup_new_launches.py --loop 3600    # run as a simple worker
+"""
+
+import argparse
+import time
+
+from app import app, cleanup_old_new_launches
+
+
+def run_once(batch_size):
+    with app.app_context():
+        removed = cleanup_old_new_launches(batch_size=batch_size)
+    if removed:
+        print(f"✓ Removed 'New Launch' from {removed} products")
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--loop", type=int, default=0, metavar="SECONDS",
+                        help="repeat every SECONDS instead of running once")
+    args = parser.parse_args()
+
+    while True:
+        run_once(args.batch_size)
+        if not args.loop:
+            break
+        time.sleep(args.loop)
@@ -0,0 +1,19 @@
+# migrate_add_co_purchase_rank_index.py
+from app import db, app
+from sqlalchemy import text
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        try:
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_product_co_purchase_rank "
+                "ON product_co_purchase (product_id, count DESC, other_id)"
+            ))
+            # Superseded: it still needed a temp B-tree for the tie-break
+            conn.execute(text("DROP INDEX IF EXISTS ix_product_co_purchase_top"))
+            conn.commit()
+            print("ix_product_co_purchase_rank created")
+        except Exception as e:
+            print("Error:", e)
+
+    print("Migration script finished.")
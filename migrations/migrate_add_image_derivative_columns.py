@@ -0,0 +1,19 @@
+# migrate_add_image_derivative_columns.py
+from app import db, app
+from sqlalchemy import text
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        for column, ddl in [
+            ("width", "INTEGER"),
+            ("height", "INTEGER"),
+            ("derivatives", "TEXT"),
+        ]:
+            try:
+                conn.execute(text(f"ALTER TABLE product_image ADD COLUMN {column} {ddl}"))
+                print(f"{column} added")
+            except Exception as e:
+                print(f"{column} probably exists or failed:", e)
+        conn.commit()
+
+    print("Migration script finished. Run backfill_image_derivatives.py next.")
@@ -0,0 +1,14 @@
+# migrate_add_image_status_column.py
+from app import db, app
+from sqlalchemy import text
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        try:
+            conn.execute(text("ALTER TABLE product_image ADD COLUMN status VARCHAR(20) DEFAULT 'ready'"))
+            print("status added")
+        except Exception as e:
+            print("status probably exists or failed:", e)
+        conn.commit()
+
+    print("Migration script finished.")
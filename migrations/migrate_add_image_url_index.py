@@ -0,0 +1,11 @@
+# migrate_add_image_url_index.py
+from app import db, app
+from sqlalchemy import text
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_product_image_image_url ON product_image (image_url)"))
+        conn.commit()
+        print("ix_product_image_image_url created")
+
+    print("Migration script finished.")
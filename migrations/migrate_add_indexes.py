@@ -0,0 +1,26 @@
+# migrate_add_indexes.py
+# Indexes for the columns the app filters on (webhook lookup, admin order
+# list/dashboard, order items, variant lookups). Shop listing indexes are
+# created by migrate_add_shop_listing_index.py. Safe to re-run.
+from app import db, app
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_order_razorpay_order_id", '"order" (razorpay_order_id)'),
+    ("ix_order_created_at", '"order" (created_at)'),
+    ("ix_order_item_order_id", "order_item (order_id)"),
+    ("ix_product_variant_product_type", "product_variant (product_id, variant_type)"),
+]
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        for name, target in INDEXES:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                print(f"{name} created")
+            except Exception as e:
+                print(f"{name} failed:", e)
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+
+    print("Migration script finished.")
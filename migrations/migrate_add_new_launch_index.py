@@ -0,0 +1,11 @@
+# migrate_add_new_launch_index.py
+from app import db, app
+from sqlalchemy import text
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_product_new_launch_date ON product (new_launch_date)"))
+        conn.commit()
+        print("ix_product_new_launch_date created")
+
+    print("Migration script finished.")
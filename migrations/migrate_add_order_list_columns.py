@@ -0,0 +1,38 @@
+# migrate_add_order_list_columns.py
+# Admin order list: precomputed order.item_count (backfilled from order_item)
+# and the indexes behind its filters and phone/name search.
+# Safe to re-run.
+from app import db, app
+from sqlalchemy import text
+
+INDEXES = [
+    ("ix_order_status_created", '"order" (status, created_at)'),
+    ("ix_order_payment_status_created", '"order" (payment_status, created_at)'),
+    ("ix_order_phone", '"order" (phone)'),
+    ("ix_order_customer_name_nocase", '"order" (customer_name COLLATE NOCASE)'),
+]
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        try:
+            conn.execute(text('ALTER TABLE "order" ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0'))
+            print("item_count added")
+        except Exception as e:
+            print("item_count probably exists or failed:", e)
+
+        conn.execute(text(
+            'UPDATE "order" SET item_count = COALESCE('
+            '(SELECT SUM(quantity) FROM order_item WHERE order_item.order_id = "order".id), 0)'
+        ))
+        print("item_count backfilled")
+
+        for name, target in INDEXES:
+            try:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+                print(f"{name} created")
+            except Exception as e:
+                print(f"{name} failed:", e)
+        conn.execute(text("ANALYZE"))
+        conn.commit()
+
+    print("Migration script finished.")
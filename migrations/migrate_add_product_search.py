@@ -0,0 +1,23 @@
+# migrate_add_product_search.py
+# Full-text search: creates the product_fts / product_suggest_fts FTS5 tables
+# plus the triggers that keep them in sync with product, then (re)indexes every
+# existing product.
+# Safe to re-run.
+from app import db, app
+from sqlalchemy import text
+from utils.search import FTS_SCHEMA, FTS_REBUILD
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        try:
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            for statement in FTS_REBUILD:
+                conn.execute(text(statement))
+            conn.commit()
+            count = conn.execute(text("SELECT count(*) FROM product_fts")).scalar()
+            print(f"product_fts ready ({count} products indexed)")
+        except Exception as e:
+            print("product_fts failed:", e)
+
+    print("Migration script finished.")
@@ -0,0 +1,18 @@
+# migrate_add_shop_listing_index.py
+from app import db, app
+from sqlalchemy import text
+
+# Shop listing pages walk these in order: one for a category, one for "All"
+INDEXES = [
+    ("ix_product_category_new_launch_id", "product (category, is_new_launch, id)"),
+    ("ix_product_new_launch_id", "product (is_new_launch, id)"),
+]
+
+with app.app_context():
+    with db.engine.connect() as conn:
+        for name, target in INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+            print(f"{name} created")
+        conn.commit()
+
+    print("Migration script finished.")
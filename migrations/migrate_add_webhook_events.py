@@ -0,0 +1,28 @@
+# migrate_add_webhook_events.py
+# Queued Razorpay webhook processing: webhook_event and order_refund tables,
+# order.refunded_amount for refund events, and an index for looking orders
+# up by payment id.
+# Safe to re-run.
+from app import db, app, WebhookEvent, OrderRefund
+from sqlalchemy import text
+
+with app.app_context():
+    WebhookEvent.__table__.create(db.engine, checkfirst=True)
+    OrderRefund.__table__.create(db.engine, checkfirst=True)
+    print("webhook_event / order_refund ready")
+
+    with db.engine.connect() as conn:
+        try:
+            conn.execute(text('ALTER TABLE "order" ADD COLUMN refunded_amount INTEGER NOT NULL DEFAULT 0'))
+            print("refunded_amount added")
+        except Exception as e:
+            print("refunded_amount probably exists or failed:", e)
+
+        try:
+            conn.execute(text('CREATE INDEX IF NOT EXISTS ix_order_razorpay_payment_id ON "order" (razorpay_payment_id)'))
+            print("ix_order_razorpay_payment_id created")
+        except Exception as e:
+            print("ix_order_razorpay_payment_id failed:", e)
+        conn.commit()
+
+    print("Migration script finished.")
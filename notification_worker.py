@@ -0,0 +1,38 @@
+"""
+Send queued order notifications from notification_outbox.
+
+Checkout only writes the outbox row; run this alongside the web app:
+
+    python notification_worker.py                 # poll every 5 seconds
+    python notification_worker.py --once          # drain one batch and exit
+    python notification_worker.py --transport fake
+"""
+
+import argparse
+import time
+
+from app import app, process_notification_outbox
+from utils.notifications import get_transport
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=5.0,
+                        help="seconds to sleep when the outbox is empty")
+    parser.add_argument("--transport", default=None,
+                        help="twilio or fake (default: NOTIFICATION_TRANSPORT env)")
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    transport = get_transport(args.transport)
+
+    while True:
+        with app.app_context():
+            sent, failed = process_notification_outbox(transport, batch_size=args.batch_size)
+        if sent or failed:
+            print(f"✓ Sent {sent} notifications, {failed} failed")
+        if args.once:
+            break
+        if sent + failed < args.batch_size:
+            time.sleep(args.interval)
@@ -0,0 +1,35 @@
+"""
+Finish product images left in "processing" state, e.g. after the web
+server restarted before its image pool was done.
+
+    python process_pending_images.py
+"""
+
+import os
+
+from app import app, ProductImage, IMAGE_PROCESSING, finish_product_image
+from utils.image_utils import process_staged_image, static_root
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        root = static_root()
+        pending = [
+            (img.id, img.image_url)
+            for img in ProductImage.query.filter_by(status=IMAGE_PROCESSING).all()
+        ]
+
+    done = failed = 0
+    for image_id, staged in pending:
+        if not os.path.exists(os.path.join(root, *staged.split("/"))):
+            finish_product_image(image_id, staged, error=FileNotFoundError(staged))
+            failed += 1
+            continue
+        try:
+            finish_product_image(image_id, staged, result=process_staged_image(root, staged))
+            done += 1
+        except Exception as e:
+            finish_product_image(image_id, staged, error=e)
+            failed += 1
+
+    print(f"✓ Processed {done} pending images, {failed} failed")
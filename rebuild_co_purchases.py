@@ -0,0 +1,42 @@
+"""
+Rebuild the "frequently bought together" table from every paid order.
+
+Paid orders are added incrementally as they arrive; run this once after
+deploying, or whenever the table needs to be recomputed from scratch:
+
+    python rebuild_co_purchases.py
+"""
+
+from app import app, db, Order, OrderItem, ProductCoPurchase, PAYMENT_PAID, record_co_purchases
+
+
+BATCH_SIZE = 500
+
+if __name__ == "__main__":
+    with app.app_context():
+        db.create_all()
+        ProductCoPurchase.query.delete()
+
+        # Items arrive grouped by order, so each order is folded in as soon as it ends
+        rows = db.session.query(OrderItem.order_id, OrderItem.product_id)\
+            .join(Order, Order.id == OrderItem.order_id)\
+            .filter(Order.payment_status == PAYMENT_PAID)\
+            .order_by(OrderItem.order_id)\
+            .yield_per(BATCH_SIZE)
+
+        orders = 0
+        current_id, product_ids = None, []
+        for order_id, product_id in rows:
+            if order_id != current_id:
+                if product_ids:
+                    record_co_purchases(product_ids)
+                    orders += 1
+                current_id, product_ids = order_id, []
+            product_ids.append(product_id)
+        if product_ids:
+            record_co_purchases(product_ids)
+            orders += 1
+
+        db.session.commit()
+        print(f"✓ Rebuilt co-purchase pairs from {orders} paid orders "
+              f"({ProductCoPurchase.query.count()} rows)")
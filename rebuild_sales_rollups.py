@@ -0,0 +1,51 @@
+"""
+Recompute the daily sales rollups behind the admin dashboard from the
+order history. New orders and payments keep them current on their own;
+run this once after deploying, or if the numbers ever look off:
+
+    python rebuild_sales_rollups.py
+"""
+
+from datetime import datetime
+
+from app import app, db, Order, OrderItem, DailySales, DailyProductSales, PAYMENT_PAID
+
+
+def to_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        db.create_all()
+        DailySales.query.delete()
+        DailyProductSales.query.delete()
+
+        day = db.func.date(Order.created_at)
+        is_paid = Order.payment_status == PAYMENT_PAID
+        days = db.session.query(
+            day,
+            db.func.count(Order.id),
+            db.func.sum(db.case((is_paid, 1), else_=0)),
+            db.func.sum(db.case((is_paid, Order.total_amount - Order.refunded_amount), else_=0)),
+        ).group_by(day).all()
+
+        products = db.session.query(
+            day,
+            OrderItem.product_id,
+            db.func.sum(OrderItem.quantity),
+            db.func.sum(OrderItem.quantity * OrderItem.unit_price),
+        ).join(Order, Order.id == OrderItem.order_id)\
+            .filter(is_paid)\
+            .group_by(day, OrderItem.product_id).all()
+
+        db.session.add_all(
+            DailySales(day=to_date(d), orders=orders, paid_orders=paid or 0, revenue=revenue or 0)
+            for d, orders, paid, revenue in days if d
+        )
+        db.session.add_all(
+            DailyProductSales(day=to_date(d), product_id=pid, units=units, revenue=revenue)
+            for d, pid, units, revenue in products if d
+        )
+        db.session.commit()
+        print(f"✓ Rebuilt sales rollups: {len(days)} days, {len(products)} product-day rows")
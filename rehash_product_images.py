@@ -0,0 +1,72 @@
+"""
+Move product images saved under the old <timestamp>_<uuid>.jpg names to
+content-addressed names (products/<hash>.jpg), so they get immutable
+caching and duplicates collapse into one file.
+
+- Rows pointing at the same content end up sharing one file
+- Derivatives are regenerated for the new name; old uploads are removed
+  once nothing references them (seed images shipped in the repo are kept)
+
+    python rehash_product_images.py
+"""
+
+import json
+import os
+import re
+
+from app import app, db, Product, ProductImage, release_image_files
+from utils.image_utils import (
+    CONTENT_ADDRESSED_RE, content_hash, generate_derivatives, static_root
+)
+
+OLD_UPLOAD_RE = re.compile(r"^products/\d+_[0-9a-f]{32}\.jpg$")
+
+
+def rehash():
+    root = static_root()
+    moved = 0
+
+    old_urls = {
+        url for (url,) in db.session.query(ProductImage.image_url).distinct()
+        if url.startswith("products/") and not CONTENT_ADDRESSED_RE.match(url)
+    }
+
+    for old_url in sorted(old_urls):
+        old_path = os.path.join(root, *old_url.split("/"))
+        if not os.path.exists(old_path):
+            print(f"✗ Missing file: {old_url}")
+            continue
+
+        with open(old_path, "rb") as f:
+            data = f.read()
+        new_url = f"products/{content_hash(data)}.jpg"
+        new_path = os.path.join(root, *new_url.split("/"))
+        if not os.path.exists(new_path):
+            with open(new_path, "wb") as f:
+                f.write(data)
+
+        meta = generate_derivatives(new_url)
+        old_derivatives = None
+        for image in ProductImage.query.filter_by(image_url=old_url).all():
+            old_derivatives = (image.derivative_data or {}).get("derivatives") or old_derivatives
+            image.image_url = new_url
+            image.width = meta["width"]
+            image.height = meta["height"]
+            image.derivatives = json.dumps(meta["derivatives"])
+        Product.query.filter_by(image_url=old_url).update(
+            {Product.image_url: new_url}, synchronize_session=False
+        )
+        db.session.commit()
+
+        if OLD_UPLOAD_RE.match(old_url):
+            release_image_files(old_url, old_derivatives)
+        moved += 1
+        print(f"✓ {old_url} -> {new_url}")
+
+    return moved
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        moved = rehash()
+    print(f"✓ Rehashed {moved} images")
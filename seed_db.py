@@ -1,4 +1,4 @@
-from app import app, db, Product
+from app import app, db, Product, rebuild_home_layout
 
 if __name__ == "__main__":
     with app.app_context():
@@ -94,6 +94,7 @@ if __name__ == "__main__":
         # ⬆️ Add more products like p5, p6, etc. if you want
 
         db.session.add_all([p1, p2, p3, p4,p5,p6,p7,p8,p9,p10])
+        rebuild_home_layout()
         db.session.commit()
 
         print("New products added!")
@@ -0,0 +1,50 @@
+"""
+Copy the SQLite primary to a file used as a local read replica.
+
+Point the app at the copy and refresh it on a schedule:
+
+    export DATABASE_REPLICA_URLS=sqlite:////path/to/replica.db
+    python snapshot_replica.py /path/to/replica.db
+    python snapshot_replica.py /path/to/replica.db --loop 5    # refresh every 5s
+
+Uses SQLite's online backup, so the copy is consistent even while the shop
+is writing, and readers of the copy never see a half-written file.
+"""
+
+import argparse
+import sqlite3
+import time
+
+from app import app, db
+
+
+def snapshot(source_path, target_path):
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        with target:
+            source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("target", help="replica database file to (over)write")
+    parser.add_argument("--loop", type=float, default=0, metavar="SECONDS",
+                        help="repeat every SECONDS instead of running once")
+    args = parser.parse_args()
+
+    with app.app_context():
+        url = db.engine.url
+    if url.get_backend_name() != "sqlite" or not url.database:
+        raise SystemExit("snapshot_replica.py only copies a file-based SQLite primary")
+
+    while True:
+        started = time.monotonic()
+        snapshot(url.database, args.target)
+        print(f"✓ Snapshot written to {args.target} in {time.monotonic() - started:.2f}s")
+        if not args.loop:
+            break
+        time.sleep(args.loop)
@@ -0,0 +1,107 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# The app binds its engine at import time, so point it at a throwaway
+# database before anything imports it.
+_DB_DIR = tempfile.mkdtemp(prefix="kcx-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(_DB_DIR, "store.db")
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["ORDER_WRITE_QUEUE"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as store  # noqa: E402
+
+PRODUCT_COUNT = 30
+IMAGES_PER_PRODUCT = 3
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DB_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app():
+    store.app.config["TESTING"] = True
+    with store.app.app_context():
+        categories = store.get_category_names()
+        for i in range(PRODUCT_COUNT):
+            product = store.Product(
+                name=f"Product {i}",
+                price=100 + i,
+                sale_price=90 if i % 4 == 0 else None,
+                description="Hand made " * 10,
+                image_url="products/teddy.jpg",
+                category=categories[i % len(categories)],
+                is_bestseller=i % 3 == 0,
+                is_new_launch=i % 5 == 0,
+            )
+            store.db.session.add(product)
+            store.db.session.flush()
+            for index in range(IMAGES_PER_PRODUCT):
+                store.db.session.add(store.ProductImage(
+                    product_id=product.id, image_url="products/teddy.jpg", order_index=index
+                ))
+            store.db.session.add(store.ProductVariant(
+                product_id=product.id, variant_type="color", name="Red",
+                code="#ff0000", price_adjustment=10, image_indices="[0]",
+            ))
+            store.db.session.add(store.ProductVariant(
+                product_id=product.id, variant_type="size", name="Large",
+                price_adjustment=5, image_indices="[]",
+            ))
+        store.catalog_changed()
+        store.db.session.commit()
+    yield store.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess["is_admin"] = True
+    return client
+
+
+@pytest.fixture
+def product_ids(app):
+    with app.app_context():
+        return [row.id for row in store.db.session.query(store.Product.id).order_by(store.Product.id)]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    """count_queries(fn) -> (result, statements executed while running fn)."""
+    with app.app_context():
+        engine = store.db.engine
+
+    def run(fn):
+        counter = QueryCounter()
+        event.listen(engine, "before_cursor_execute", counter)
+        try:
+            result = fn()
+        finally:
+            event.remove(engine, "before_cursor_execute", counter)
+        return result, counter.statements
+    return run
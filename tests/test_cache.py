@@ -0,0 +1,37 @@
+import app as store
+from utils.cache import VersionedKeyedCache
+
+
+def test_entry_loaded_across_invalidate_is_not_stored():
+    loads = []
+
+    def loader(key):
+        loads.append(key)
+        if len(loads) == 1:
+            cache.invalidate()  # a commit lands while the first load runs
+        return len(loads)
+
+    cache = VersionedKeyedCache(loader, lambda: 0)
+    assert cache.get("a") == 1
+    assert cache.get("a") == 2
+    assert cache.get("a") == 2
+
+
+def test_catalog_caches_clear_only_after_commit(app):
+    with app.app_context():
+        store.get_category_names()
+        assert store.category_cache._loaded
+
+        store.catalog_changed(categories=True)
+        assert store.category_cache._loaded  # not yet: the change is uncommitted
+        store.db.session.commit()
+        assert not store.category_cache._loaded
+
+
+def test_rolled_back_change_keeps_caches(app):
+    with app.app_context():
+        store.get_category_names()
+        store.catalog_changed(categories=True)
+        store.db.session.rollback()
+        store.db.session.commit()
+        assert store.category_cache._loaded
@@ -0,0 +1,115 @@
+import json
+import threading
+
+import app as store
+
+CHECKOUT_FORM = {"name": "A", "phone": "9", "address": "x", "city": "c", "pincode": "1"}
+
+
+def _new_cart(client, product_id):
+    client.get(f"/add/{product_id}")
+    return client.get_cookie(store.CART_COOKIE).value
+
+
+def _stored_items(app, cart_id):
+    with app.app_context():
+        return store._read_cart_row(cart_id)
+
+
+def _write_row_elsewhere(app, cart_id, items):
+    """Change the cart the way another worker process would, behind our cache."""
+    with app.app_context():
+        store.db.session.execute(
+            store.db.update(store.Cart).where(store.Cart.id == cart_id).values(items=json.dumps(items))
+        )
+        store.db.session.commit()
+
+
+def test_concurrent_adds_are_not_lost(app, product_ids):
+    product_id = product_ids[0]
+    cart_id = _new_cart(app.test_client(), product_id)
+    threads, adds, errors = 8, 5, []
+
+    def shopper():
+        client = app.test_client()
+        client.set_cookie(store.CART_COOKIE, cart_id)
+        for _ in range(adds):
+            if client.get(f"/add/{product_id}").status_code != 302:
+                errors.append("add failed")
+
+    workers = [threading.Thread(target=shopper) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    assert _stored_items(app, cart_id) == {str(product_id): 1 + threads * adds}
+
+
+def test_checkout_prices_the_stored_cart_not_the_cached_copy(app, client, product_ids):
+    a, b = product_ids[1], product_ids[2]
+    cart_id = _new_cart(client, a)
+    client.get("/cart")  # warms this process's cart cache with {a: 1}
+    _write_row_elsewhere(app, cart_id, {str(a): 1, str(b): 5})
+
+    response = client.post("/checkout_ajax", data=CHECKOUT_FORM)
+    assert response.status_code == 200
+    with app.app_context():
+        items = store.OrderItem.query.filter_by(order_id=response.get_json()["order_id"]).all()
+        assert {i.product_id: i.quantity for i in items} == {a: 1, b: 5}
+
+
+def test_checkout_keeps_items_added_after_the_quote(app, client, product_ids, monkeypatch):
+    a, b = product_ids[3], product_ids[4]
+    cart_id = _new_cart(client, a)
+
+    place_order = store.place_order
+
+    def add_elsewhere_then_place(quote, **fields):
+        # Another tab adds an item while this order is being written
+        _write_row_elsewhere(app, cart_id, {str(a): 1, str(b): 2})
+        return place_order(quote, **fields)
+    monkeypatch.setattr(store, "place_order", add_elsewhere_then_place)
+
+    response = client.post("/checkout", data=CHECKOUT_FORM)
+    assert response.status_code == 302
+    assert _stored_items(app, cart_id) == {str(b): 2}
+
+
+def test_checkout_of_a_cart_emptied_elsewhere_places_no_order(app, client, product_ids):
+    cart_id = _new_cart(client, product_ids[5])
+    client.get("/cart")  # this process still caches one line
+    _write_row_elsewhere(app, cart_id, {})
+
+    with app.app_context():
+        orders_before = store.Order.query.count()
+
+    response = client.post("/checkout", data=CHECKOUT_FORM)
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/cart")
+    with app.app_context():
+        assert store.Order.query.count() == orders_before
+
+
+def test_cart_thumbnails_use_image_derivatives(app, client, count_queries):
+    thumb = "products/" + "c" * 32 + "_320w.jpg"
+    with app.app_context():
+        product = store.Product(name="Thumb test", price=100, description="Soft", image_url="products/" + "c" * 32 + ".jpg")
+        store.db.session.add(product)
+        store.db.session.flush()
+        store.db.session.add(store.ProductImage(
+            product_id=product.id, image_url=product.image_url, width=800, height=800,
+            derivatives=json.dumps({"jpeg": [[320, thumb]], "webp": [[320, thumb[:-3] + "webp"]]}),
+        ))
+        store.db.session.commit()
+        product_id = product.id
+
+    client.get(f"/add/{product_id}")
+    client.get("/cart")
+    response, statements = count_queries(lambda: client.get("/cart"))
+    html = response.get_data(as_text=True)
+
+    # Drawer and cart page both render the srcset, from one extra images query
+    assert html.count(f"/static/{thumb} 320w") == 2
+    assert sum("FROM product_image" in s for s in statements) == 1
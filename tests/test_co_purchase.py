@@ -0,0 +1,25 @@
+import app as store
+
+
+def test_also_bought_query_uses_index_without_sorting(app):
+    with app.app_context():
+        query = store.db.session.query(store.ProductCoPurchase.other_id)\
+            .filter(store.ProductCoPurchase.product_id == 1)\
+            .order_by(store.ProductCoPurchase.count.desc(), store.ProductCoPurchase.other_id)\
+            .limit(4)
+        sql = str(query.statement.compile(compile_kwargs={"literal_binds": True}))
+        plan = " ".join(row[-1] for row in store.db.session.execute(store.text("EXPLAIN QUERY PLAN " + sql)))
+
+    assert "ix_product_co_purchase_rank" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_co_purchases_ranked_by_count_then_id(app, product_ids):
+    a, b, c, d = product_ids[:4]
+    with app.app_context():
+        store.record_co_purchases([a, c])
+        store.record_co_purchases([a, b])
+        store.record_co_purchases([a, d])
+        store.record_co_purchases([a, d])
+        store.db.session.commit()
+        assert store.co_purchased_ids(a, 3) == [d, b, c]
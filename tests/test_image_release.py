@@ -0,0 +1,98 @@
+import os
+
+import pytest
+
+import app as store
+
+STORED = "products/" + "a" * 32 + ".jpg"
+DERIVATIVES = {"jpeg": [[320, "products/" + "a" * 32 + "_320w.jpg"]], "webp": []}
+
+
+@pytest.fixture
+def static_dir(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "root_path", str(tmp_path))
+    (tmp_path / "static" / "products").mkdir(parents=True)
+    return tmp_path / "static"
+
+
+def _write_files(static_dir):
+    for rel in (STORED, DERIVATIVES["jpeg"][0][1]):
+        (static_dir / rel).write_bytes(b"jpeg")
+
+
+def _processing_image(product_id):
+    image = store.ProductImage(
+        product_id=product_id, image_url="uploads/pending/x.jpg", status=store.IMAGE_PROCESSING
+    )
+    store.db.session.add(image)
+    store.db.session.commit()
+    return image.id
+
+
+def test_release_keeps_referenced_files(app, static_dir, product_ids):
+    _write_files(static_dir)
+    with app.app_context():
+        image = store.ProductImage(product_id=product_ids[0], image_url=STORED)
+        store.db.session.add(image)
+        store.db.session.commit()
+
+        store.release_image_files(STORED, DERIVATIVES)
+        assert (static_dir / STORED).exists()
+
+        store.db.session.delete(image)
+        store.db.session.commit()
+        store.release_image_files(STORED, DERIVATIVES)
+        assert not (static_dir / STORED).exists()
+        assert not (static_dir / DERIVATIVES["jpeg"][0][1]).exists()
+
+
+def test_finish_refuses_files_released_meanwhile(app, static_dir, product_ids):
+    with app.app_context():
+        image_id = _processing_image(product_ids[0])
+
+    # The worker reused an identical stored image that was then released
+    result = {"image_url": STORED, "width": 800, "height": 600, "derivatives": DERIVATIVES}
+    store.finish_product_image(image_id, "uploads/pending/x.jpg", result=result)
+
+    with app.app_context():
+        image = store.db.session.get(store.ProductImage, image_id)
+        assert image.status == store.IMAGE_FAILED
+        assert image.image_url == "uploads/pending/x.jpg"
+        store.db.session.delete(image)
+        store.db.session.commit()
+
+
+def test_finish_stores_processed_image(app, static_dir, product_ids):
+    _write_files(static_dir)
+    with app.app_context():
+        image_id = _processing_image(product_ids[0])
+
+    result = {"image_url": STORED, "width": 800, "height": 600, "derivatives": DERIVATIVES}
+    store.finish_product_image(image_id, "uploads/pending/x.jpg", result=result)
+
+    with app.app_context():
+        image = store.db.session.get(store.ProductImage, image_id)
+        assert image.status == store.IMAGE_READY
+        assert image.image_url == STORED
+        store.db.session.delete(image)
+        store.db.session.commit()
+
+
+def test_deleting_an_image_changes_the_product_etag(app, admin_client, static_dir, product_ids):
+    _write_files(static_dir)
+    with app.app_context():
+        image = store.ProductImage(product_id=product_ids[0], image_url=STORED)
+        store.db.session.add(image)
+        store.db.session.commit()
+        image_id = image.id
+
+    url = f"/api/products/{product_ids[0]}"
+    before = admin_client.get(url)
+    assert STORED in before.get_data(as_text=True)
+
+    assert admin_client.post(f"/admin/products/delete-image/{image_id}").get_json()["success"]
+
+    after = admin_client.get(url, headers={"If-None-Match": before.headers["ETag"]})
+    assert after.status_code == 200
+    assert after.headers["ETag"] != before.headers["ETag"]
+    assert STORED not in after.get_data(as_text=True)
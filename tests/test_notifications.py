@@ -0,0 +1,111 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as store
+from utils.notifications import FakeSmsTransport
+
+Outbox = store.NotificationOutbox
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        Outbox.query.delete()
+        store.db.session.commit()
+        yield
+        Outbox.query.delete()
+        store.db.session.commit()
+
+
+def _queue(key="order:1:admin_sms", body="new order"):
+    store.db.session.add(Outbox(dedupe_key=key, recipient="+910000000000", body=body))
+    store.db.session.commit()
+    return Outbox.query.filter_by(dedupe_key=key).one().id
+
+
+def _row(row_id):
+    store.db.session.expire_all()
+    return store.db.session.get(Outbox, row_id)
+
+
+def test_delivers_pending_notification(ctx):
+    row_id = _queue(body="order #1")
+    transport = FakeSmsTransport()
+
+    assert store.process_notification_outbox(transport) == (1, 0)
+    assert transport.sent == [{"to": "+910000000000", "body": "order #1"}]
+    row = _row(row_id)
+    assert row.status == store.NOTIFY_SENT
+    assert row.attempts == 1
+    assert row.sent_at is not None
+
+
+def test_failed_send_backs_off_then_retries(ctx):
+    row_id = _queue()
+    transport = FakeSmsTransport(fail_times=1)
+
+    assert store.process_notification_outbox(transport) == (0, 1)
+    row = _row(row_id)
+    assert row.status == store.NOTIFY_PENDING
+    assert row.last_error == "fake transport failure"
+    delay = (row.next_attempt_at - datetime.utcnow()).total_seconds()
+    assert store.NOTIFY_BACKOFF_SECONDS - 5 < delay <= store.NOTIFY_BACKOFF_SECONDS
+
+    # Not due yet
+    assert store.process_notification_outbox(transport) == (0, 0)
+
+    row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    store.db.session.commit()
+    assert store.process_notification_outbox(transport) == (1, 0)
+    assert len(transport.sent) == 1
+    assert _row(row_id).attempts == 2
+
+
+def test_gives_up_after_max_attempts(ctx):
+    row_id = _queue()
+    transport = FakeSmsTransport(fail_times=store.NOTIFY_MAX_ATTEMPTS)
+
+    for _ in range(store.NOTIFY_MAX_ATTEMPTS):
+        row = _row(row_id)
+        row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        store.db.session.commit()
+        store.process_notification_outbox(transport)
+
+    row = _row(row_id)
+    assert row.status == store.NOTIFY_FAILED
+    assert row.attempts == store.NOTIFY_MAX_ATTEMPTS
+    assert transport.sent == []
+
+
+def test_sent_notification_is_never_sent_again(ctx):
+    _queue()
+    transport = FakeSmsTransport()
+
+    store.process_notification_outbox(transport)
+    store.process_notification_outbox(transport)
+    assert len(transport.sent) == 1
+
+
+def test_row_claimed_by_another_worker_is_skipped(ctx):
+    row_id = _queue()
+    row = _row(row_id)
+    row.status = store.NOTIFY_SENDING
+    row.claimed_at = datetime.utcnow()
+    store.db.session.commit()
+
+    transport = FakeSmsTransport()
+    assert store.process_notification_outbox(transport) == (0, 0)
+    assert transport.sent == []
+
+
+def test_order_notification_is_queued_once(ctx):
+    order = store.Order(customer_name="A", phone="9", address="x", total_amount=100)
+    store.db.session.add(order)
+    store.db.session.flush()
+    store.enqueue_order_notification(order)
+    store.db.session.flush()
+    store.enqueue_order_notification(order)
+    store.db.session.commit()
+
+    assert Outbox.query.filter_by(dedupe_key=f"order:{order.id}:admin_sms").count() == 1
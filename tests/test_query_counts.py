@@ -0,0 +1,48 @@
+"""
+Per-route query budgets for the catalog pages.
+
+Every listing touches product.images (and the product page variants) for
+each card, so a lost selectinload/load_only shows up here as one query per
+product. Budgets are for a cold request, with the in-process caches empty.
+"""
+
+import pytest
+
+import app as store
+
+from conftest import PRODUCT_COUNT
+
+
+@pytest.fixture(autouse=True)
+def cold_caches(app):
+    for cache in (store.category_cache, store.home_layout_cache,
+                  store.catalog_index_cache, store.variant_payload_cache, store.api_cache):
+        cache.invalidate()
+
+
+ROUTE_BUDGETS = [
+    ("/", 8),
+    ("/shop", 6),
+    ("/admin/products", 6),
+]
+
+
+@pytest.mark.parametrize("url,budget", ROUTE_BUDGETS)
+def test_catalog_route_query_budget(admin_client, count_queries, url, budget):
+    response, statements = count_queries(lambda: admin_client.get(url))
+    assert response.status_code == 200
+    assert len(statements) <= budget, "\n".join(statements)
+    assert len(statements) < PRODUCT_COUNT
+
+
+def test_product_page_query_budget(client, count_queries, product_ids):
+    response, statements = count_queries(lambda: client.get(f"/product/{product_ids[0]}"))
+    assert response.status_code == 200
+    assert len(statements) <= 10, "\n".join(statements)
+
+
+def test_warm_product_page_stays_small(client, count_queries, product_ids):
+    client.get(f"/product/{product_ids[1]}")
+    response, statements = count_queries(lambda: client.get(f"/product/{product_ids[1]}"))
+    assert response.status_code == 200
+    assert len(statements) <= 3, "\n".join(statements)
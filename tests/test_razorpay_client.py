@@ -0,0 +1,57 @@
+import pytest
+import requests
+
+from utils.razorpay_client import CircuitBreaker, CircuitOpenError, GatewaySession
+
+
+def _session(monkeypatch, error):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    session = GatewaySession(timeout=1, breaker=breaker)
+
+    def fail(self, method, url, **kwargs):
+        raise error
+    monkeypatch.setattr(requests.Session, "request", fail)
+    return session, breaker
+
+
+@pytest.mark.parametrize("error", [
+    requests.exceptions.ConnectionError("down"),
+    ValueError("bad url"),
+])
+def test_any_failure_settles_half_open_trial(monkeypatch, error):
+    session, breaker = _session(monkeypatch, error)
+
+    for _ in range(3):
+        # reset_timeout=0: every call is a half-open trial; a stuck trial
+        # flag would turn the later ones into CircuitOpenError
+        with pytest.raises(type(error)):
+            session.request("GET", "https://api.razorpay.test/v1/orders")
+    assert breaker.is_open
+    assert not breaker._trial_in_flight
+
+
+@pytest.mark.parametrize("error", [KeyboardInterrupt(), SystemExit()])
+def test_interrupt_is_not_a_gateway_failure(monkeypatch, error):
+    session, breaker = _session(monkeypatch, error)
+
+    with pytest.raises(type(error)):
+        session.request("GET", "https://api.razorpay.test/v1/orders")
+    assert not breaker.is_open
+    assert breaker._failures == 0
+
+
+def test_interrupted_half_open_trial_is_released(monkeypatch):
+    session, breaker = _session(monkeypatch, KeyboardInterrupt())
+    breaker.record_failure()
+
+    with pytest.raises(KeyboardInterrupt):
+        session.request("GET", "https://api.razorpay.test/v1/orders")
+    assert breaker.is_open
+    assert not breaker._trial_in_flight
+
+
+def test_open_breaker_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
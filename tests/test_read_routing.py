@@ -0,0 +1,56 @@
+import sqlite3
+
+import pytest
+from flask import g
+from sqlalchemy import create_engine, event
+
+import app as store
+from utils.db_routing import replica_reads
+
+
+@pytest.fixture
+def replica(app, tmp_path):
+    """A file-copy replica registered as replica_0, plus per-engine statement logs."""
+    with app.app_context():
+        path = str(tmp_path / "replica.db")
+        source = sqlite3.connect(store.db.engine.url.database)
+        target = sqlite3.connect(path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+        engines = store.db._app_engines[app]
+        engines["replica_0"] = create_engine(f"sqlite:///{path}")
+        seen = {"primary": [], "replica": []}
+        listeners = [
+            (store.db.engine, lambda *a: seen["primary"].append(a[2])),
+            (engines["replica_0"], lambda *a: seen["replica"].append(a[2])),
+        ]
+        for engine, fn in listeners:
+            event.listen(engine, "before_cursor_execute", fn)
+    yield seen
+    for engine, fn in listeners:
+        event.remove(engine, "before_cursor_execute", fn)
+    engines.pop("replica_0").dispose()
+
+
+def test_catalog_reads_go_to_replica(app, replica, product_ids):
+    with app.test_request_context():
+        with replica_reads(store.db):
+            assert g.read_replica == "replica_0"
+            store.catalog_query().filter(store.Product.id == product_ids[0]).all()
+            store.db.session.query(store.Cart.id).limit(1).all()
+    assert any("FROM product" in sql for sql in replica["replica"])
+    assert not any("FROM cart" in sql for sql in replica["replica"])
+    assert any("FROM cart" in sql for sql in replica["primary"])
+
+
+def test_cache_versions_and_cached_data_come_from_primary(app, replica):
+    store.category_cache.invalidate()
+    with app.test_request_context():
+        with replica_reads(store.db):
+            store.get_cache_version("catalog")
+            store.get_category_names()
+    assert replica["replica"] == []
+    assert any("FROM cache_version" in sql for sql in replica["primary"])
+    assert any("FROM category" in sql for sql in replica["primary"])
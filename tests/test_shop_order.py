@@ -0,0 +1,61 @@
+import re
+
+import pytest
+from sqlalchemy import event
+
+import app as store
+
+
+def _listing_plan(category, after):
+    """EXPLAIN QUERY PLAN of the product SELECT shop_page() actually runs."""
+    executed = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if re.search(r"FROM product\b", statement) and "LIMIT" in statement:
+            executed.append((statement, parameters))
+
+    engine = store.db.engine
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        store.shop_page(category, after)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = executed[-1]
+    cursor = store.db.session.connection().connection.cursor()
+    rows = cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+    return " ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("after", [None, "1.40", "0.20"])
+def test_category_listing_walks_index_without_sorting(app, after):
+    with app.app_context():
+        plan = _listing_plan(store.get_category_names()[0], after)
+
+    assert "ix_product_category_new_launch_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+@pytest.mark.parametrize("after", [None, "1.40", "0.20"])
+def test_all_products_listing_walks_index_without_sorting(app, after):
+    with app.app_context():
+        plan = _listing_plan(None, after)
+
+    assert "ix_product_new_launch_id" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_listing_pages_cover_every_product_once(app, client):
+    ids, url = [], "/shop/page"
+    while url:
+        data = client.get(url).get_json()
+        ids.extend(p["id"] for p in data["products"])
+        url = data["next_url"]
+
+    with app.app_context():
+        expected = [
+            p.id for p in store.Product.query.order_by(
+                store.Product.is_new_launch.desc(), store.Product.id.desc()
+            )
+        ]
+    assert ids == expected
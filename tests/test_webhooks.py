@@ -0,0 +1,79 @@
+import json
+from uuid import uuid4
+
+import pytest
+
+import app as store
+
+
+@pytest.fixture
+def ctx(app):
+    with app.app_context():
+        store.WebhookEvent.query.delete()
+        store.db.session.commit()
+        yield
+
+
+def _order(total=500):
+    order = store.Order(
+        customer_name="A", phone="9", address="x", total_amount=total,
+        payment_status=store.PAYMENT_CREATED, razorpay_order_id=f"order_{uuid4().hex}",
+    )
+    store.db.session.add(order)
+    store.db.session.commit()
+    return order
+
+
+def _deliver(event_type, **entities):
+    body = json.dumps({
+        "event": event_type,
+        "payload": {name: {"entity": entity} for name, entity in entities.items()},
+    })
+    event_id = uuid4().hex
+    store.store_webhook_event(event_id, body)
+    store.db.session.commit()
+    assert store.process_webhook_events() == (1, 0)
+    return store.WebhookEvent.query.filter_by(event_id=event_id).one().status
+
+
+def test_refund_before_capture_is_applied_at_capture(ctx):
+    order = _order(total=500)
+    payment = {"id": f"pay_{uuid4().hex}", "order_id": order.razorpay_order_id}
+
+    status = _deliver("refund.processed",
+                      refund={"id": f"rfnd_{uuid4().hex}", "payment_id": payment["id"], "amount": 20000},
+                      payment=payment)
+    assert status == store.WEBHOOK_DONE
+    assert order.refunded_amount == 0
+
+    assert _deliver("payment.captured", payment=payment) == store.WEBHOOK_DONE
+    store.db.session.refresh(order)
+    assert order.payment_status == store.PAYMENT_PAID
+    assert order.refunded_amount == 200
+
+
+def test_full_refund_before_capture_ends_refunded(ctx):
+    order = _order(total=500)
+    payment = {"id": f"pay_{uuid4().hex}", "order_id": order.razorpay_order_id}
+
+    _deliver("refund.processed",
+             refund={"id": f"rfnd_{uuid4().hex}", "payment_id": payment["id"], "amount": 50000},
+             payment=payment)
+    _deliver("payment.captured", payment=payment)
+
+    store.db.session.refresh(order)
+    assert order.payment_status == store.PAYMENT_REFUNDED
+    assert order.refunded_amount == 500
+
+
+def test_replayed_refund_after_capture_counts_once(ctx):
+    order = _order(total=500)
+    payment = {"id": f"pay_{uuid4().hex}", "order_id": order.razorpay_order_id}
+    refund = {"id": f"rfnd_{uuid4().hex}", "payment_id": payment["id"], "amount": 10000}
+
+    _deliver("payment.captured", payment=payment)
+    assert _deliver("refund.processed", refund=refund, payment=payment) == store.WEBHOOK_DONE
+    assert _deliver("refund.processed", refund=refund, payment=payment) == store.WEBHOOK_IGNORED
+
+    store.db.session.refresh(order)
+    assert order.refunded_amount == 100
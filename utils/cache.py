@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class VersionedCache:
+    """
+    In-process cache for a single computed value.
+    - The value is rebuilt by `loader` on first use or after invalidate()
+    - `version_getter` returns a stamp stored in the DB; when another worker
+      bumps it, this process reloads on its next check
+    - The stamp is only re-read every `check_interval` seconds, so a warm
+      cache costs no queries at all
+    """
+
+    def __init__(self, loader, version_getter, check_interval=5.0):
+        self.loader = loader
+        self.version_getter = version_getter
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._value = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loaded = False
+
+    def get(self):
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.check_interval:
+            return self._value
+
+        with self._lock:
+            version = self.version_getter()
+            if not self._loaded or version != self._version:
+                self._value = self.loader()
+                self._version = version
+                self._loaded = True
+            self._checked_at = now
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+            self._value = None
+
+
+class VersionedKeyedCache:
+    """
+    Per-key variant of VersionedCache, e.g. one entry per product.
+    - `loader(key)` builds a missing entry; the least recently used entries
+      are dropped past `maxsize`
+    - A changed version stamp clears every entry at once
+    - An entry whose load overlapped a clear is returned but not stored, so
+      rows read before a commit never outlive the invalidation
+    """
+
+    def __init__(self, loader, version_getter, maxsize=512, check_interval=5.0):
+        self.loader = loader
+        self.version_getter = version_getter
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._version = None
+        self._checked_at = 0.0
+        self._generation = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at >= self.check_interval:
+                version = self.version_getter()
+                if version != self._version:
+                    self._entries.clear()
+                    self._generation += 1
+                    self._version = version
+                self._checked_at = now
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+            generation = self._generation
+
+        value = self.loader(key)
+        with self._lock:
+            if generation != self._generation:
+                return value
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+            self._checked_at = 0.0
+
+
+class LRUCache:
+    """
+    Small thread-safe LRU with a per-entry time to live.
+    - Entries older than `ttl` seconds read as missing, which bounds how
+      stale a value can be when another process changed the backing row
+    - The least recently used entries are dropped past `maxsize`
+    """
+
+    def __init__(self, maxsize=1024, ttl=5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, stored_at = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
@@ -0,0 +1,98 @@
+import random
+from contextlib import contextmanager
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g, has_app_context
+from flask_sqlalchemy.session import Session
+
+# Bind keys for replicas are "replica_0", "replica_1", ... in SQLALCHEMY_BINDS
+REPLICA_BIND_PREFIX = "replica_"
+
+
+def replica_binds(urls, engine_options=None):
+    """SQLALCHEMY_BINDS entries for a list of replica URLs."""
+    return {
+        f"{REPLICA_BIND_PREFIX}{index}": {"url": url, **(engine_options or {})}
+        for index, url in enumerate(urls)
+    }
+
+
+class RoutingSession(Session):
+    """
+    Session that sends some reads to a replica and everything else to the primary.
+    - Only SELECTs issued inside replica_reads() / @read_replica are routed
+    - Only statements against `replica_tables` are; anything else (carts,
+      orders, raw SQL) keeps read-your-writes on the primary
+    - Flushes always go to the primary, so an object read from a replica can
+      still be changed and saved
+    One replica is picked per request and kept for its remaining reads.
+    """
+
+    replica_tables = frozenset()
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and mapper is not None and self._routes_to_replica(clause):
+            table = sa.inspect(mapper).local_table
+            if getattr(table, "name", None) in self.replica_tables:
+                return self._db.engines[g.read_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _routes_to_replica(self, clause):
+        return (
+            clause is not None
+            and getattr(clause, "is_select", False)
+            and has_app_context()
+            and g.get("read_replica") is not None
+        )
+
+
+def _pick_replica(engines):
+    keys = [key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+    return random.choice(keys) if keys else None
+
+
+@contextmanager
+def replica_reads(db):
+    """Route catalog reads in this block to a replica, if any are configured."""
+    previous = g.get("read_replica")
+    if previous is None:
+        g.read_replica = g.get("chosen_replica") or _pick_replica(db.engines)
+        g.chosen_replica = g.read_replica
+    try:
+        yield
+    finally:
+        g.read_replica = previous
+
+
+@contextmanager
+def primary_reads():
+    """Send reads in this block to the primary, even inside replica_reads()."""
+    previous = g.get("read_replica") if has_app_context() else None
+    if previous is not None:
+        g.read_replica = None
+    try:
+        yield
+    finally:
+        if previous is not None:
+            g.read_replica = previous
+
+
+def on_primary(fn):
+    """Wrap `fn` so everything it reads comes from the primary."""
+    @wraps(fn)
+    def wrapped(*args, **kwargs):
+        with primary_reads():
+            return fn(*args, **kwargs)
+    return wrapped
+
+
+def read_replica(db):
+    """View decorator form of replica_reads()."""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(*args, **kwargs):
+            with replica_reads(db):
+                return view_func(*args, **kwargs)
+        return wrapped
+    return decorator
@@ -1,12 +1,74 @@
 import os
+import io
+import re
 import uuid
-import time
+import base64
+import hashlib
 from PIL import Image
-from flask import current_app
+from flask import current_app, url_for
+from markupsafe import Markup, escape
 
 # Allowed input formats from admin
 ALLOWED_EXTENSIONS = {"jpg", "jpeg", "png"}
 
+# Widths generated for srcset; never upscaled past the original
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+PLACEHOLDER_WIDTH = 16
+
+# Stored images are named by the SHA-256 of their JPEG bytes, so a URL
+# always maps to the same content and can be cached forever
+HASH_LENGTH = 32
+CONTENT_ADDRESSED_RE = re.compile(
+    r"^products/(?P<hash>[0-9a-f]{%d})(?:_(?P<width>\d+)w)?\.(?P<ext>jpg|webp)$" % HASH_LENGTH
+)
+
+def _upload_extension(file):
+    if "." not in file.filename:
+        raise ValueError("Invalid file")
+
+    ext = file.filename.rsplit(".", 1)[1].lower()
+    if ext not in ALLOWED_EXTENSIONS:
+        raise ValueError("Unsupported image type")
+    return ext
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _store_as_jpeg(source, static_root):
+    """
+    Normalizes an image (path or file object) to JPEG in static/products
+    - Named by content hash; an identical image is stored only once
+    - Returns its path: products/<hash>.jpg
+    """
+    # 1. Open, normalize, and encode image
+    with Image.open(source) as image:
+        image = image.convert("RGB")  # removes alpha, normalizes
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=90)
+    data = buffer.getvalue()
+
+    # 2. Content-addressed filename
+    filename = f"{content_hash(data)}.jpg"
+    save_path = os.path.join(static_root, "products", filename)
+
+    # 3. Ensure directory exists (safety) and skip duplicates
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    if not os.path.exists(save_path):
+        _write_atomic(save_path, data)
+
+    # 4. Return DB-safe relative path
+    return f"products/{filename}"
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
 def save_product_image(file):
     """
     Saves an uploaded product image in static/products
@@ -16,33 +78,156 @@ def save_product_image(file):
     - Safe for Windows + Linux
     - Returns DB-safe path: products/<filename>.jpg
     """
+    _upload_extension(file)
+    return _store_as_jpeg(file, static_root())
 
-    # 1. Validate extension
-    if "." not in file.filename:
-        raise ValueError("Invalid file")
 
-    ext = file.filename.rsplit(".", 1)[1].lower()
-    if ext not in ALLOWED_EXTENSIONS:
-        raise ValueError("Unsupported image type")
+def stage_upload(file):
+    """
+    Stores an upload untouched in static/uploads/pending so the request can
+    return immediately; process_staged_image() does the real work later
+    - Returns the staged path relative to static/
+    """
+    ext = _upload_extension(file)
+    filename = f"{uuid.uuid4().hex}.{ext}"
+    save_path = os.path.join(static_root(), "uploads", "pending", filename)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    file.save(save_path)
+    return f"uploads/pending/{filename}"
+
+
+def process_staged_image(root, staged_path):
+    """
+    Turns a staged upload into a stored product image with derivatives
+    - Runs in a worker process, so it takes the static root explicitly
+      instead of using the Flask app
+    - Removes the staged file when done
+    - Returns {"image_url", "width", "height", "derivatives"}
+    """
+    rel_path = _store_as_jpeg(_static_path(staged_path, root), root)
+    meta = generate_derivatives(rel_path, root)
+    os.remove(_static_path(staged_path, root))
+    return {"image_url": rel_path, **meta}
+
+
+def static_root():
+    return os.path.join(current_app.root_path, "static")
+
 
-    # 2. Generate safe unique filename
-    filename = f"{int(time.time())}_{uuid.uuid4().hex}.jpg"
+def _static_path(rel_path, root=None):
+    return os.path.join(root or static_root(), *rel_path.split("/"))
+
+
+def generate_derivatives(rel_path, root=None):
+    """
+    Writes resized copies of a stored product image next to it
+    - JPEG + WebP for every width in DERIVATIVE_WIDTHS smaller than the original
+    - A full-size WebP
+    - Files that already exist are kept (same name means same content)
+    - A tiny blurred-up placeholder, returned inline as a data URI
+    - Returns {"width", "height", "derivatives": {"jpeg", "webp", "placeholder"}}
+      where jpeg/webp are [[width, path], ...] sorted by width
+    """
+    stem = os.path.splitext(rel_path)[0]
 
-    # 3. Absolute path to static/products
-    save_path = os.path.join(
-        current_app.root_path,
-        "static",
-        "products",
-        filename
+    with Image.open(_static_path(rel_path, root)) as source:
+        image = source.convert("RGB")
+
+    width, height = image.size
+    jpeg, webp = [], []
+
+    for target in DERIVATIVE_WIDTHS:
+        if target >= width:
+            break
+
+        jpeg_path = f"{stem}_{target}w.jpg"
+        webp_path = f"{stem}_{target}w.webp"
+        if not os.path.exists(_static_path(webp_path, root)):
+            resized = image.resize((target, max(1, round(height * target / width))), Image.LANCZOS)
+            resized.save(_static_path(jpeg_path, root), "JPEG", quality=82, optimize=True, progressive=True)
+            resized.save(_static_path(webp_path, root), "WEBP", quality=80, method=4)
+        jpeg.append([target, jpeg_path])
+        webp.append([target, webp_path])
+
+    full_webp = f"{stem}.webp"
+    if not os.path.exists(_static_path(full_webp, root)):
+        image.save(_static_path(full_webp, root), "WEBP", quality=80, method=4)
+    jpeg.append([width, rel_path])
+    webp.append([width, full_webp])
+
+    tiny = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))),
+        Image.BILINEAR
     )
+    buffer = io.BytesIO()
+    tiny.save(buffer, "WEBP", quality=40)  # ~100 bytes, small enough to inline
+    placeholder = "data:image/webp;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
 
-    # 4. Ensure directory exists (safety)
-    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    return {
+        "width": width,
+        "height": height,
+        "derivatives": {"jpeg": jpeg, "webp": webp, "placeholder": placeholder},
+    }
 
-    # 5. Open, normalize, and save image
-    image = Image.open(file)
-    image = image.convert("RGB")  # removes alpha, normalizes
-    image.save(save_path, "JPEG", quality=90)
 
-    # 6. Return DB-safe relative path
-    return f"products/{filename}"
+def _image_paths(rel_path, derivatives=None):
+    paths = {rel_path}
+    for key in ("jpeg", "webp"):
+        paths.update(path for _, path in (derivatives or {}).get(key, []))
+    return paths
+
+
+def image_files_exist(rel_path, derivatives=None, root=None):
+    """True when a stored image and all its listed derivatives are on disk."""
+    return all(os.path.exists(_static_path(path, root)) for path in _image_paths(rel_path, derivatives))
+
+
+def remove_image_files(rel_path, derivatives=None, root=None):
+    """Deletes a stored image and any derivatives listed for it (missing files are ignored)."""
+    for path in _image_paths(rel_path, derivatives):
+        try:
+            os.remove(_static_path(path, root))
+        except OSError:
+            pass
+
+
+def _srcset(entries):
+    return ", ".join(f"{url_for('static', filename=path)} {w}w" for w, path in entries)
+
+
+def picture_tag(rel_path, meta=None, sizes="100vw", attrs=None, placeholder=True):
+    """
+    Builds the markup for a product image
+    - With derivative metadata: <picture> with a WebP source, JPEG srcset,
+      intrinsic width/height and (optionally) the placeholder as a background
+    - Without: a plain <img> (images not yet backfilled)
+    """
+    attrs = dict(attrs or {})
+    attrs["src"] = url_for("static", filename=rel_path)
+    attrs.setdefault("loading", "lazy")
+    attrs.setdefault("decoding", "async")
+
+    derivatives = (meta or {}).get("derivatives")
+    if not derivatives:
+        return Markup("<img %s>") % Markup(_attr_string(attrs))
+
+    attrs["srcset"] = _srcset(derivatives["jpeg"])
+    attrs["sizes"] = sizes
+    attrs["width"] = meta["width"]
+    attrs["height"] = meta["height"]
+    if placeholder and derivatives.get("placeholder"):
+        background = f"background: url({derivatives['placeholder']}) center / cover no-repeat;"
+        attrs["style"] = background + " " + attrs.get("style", "")
+
+    source = Markup('<source type="image/webp" srcset="%s" sizes="%s">') % (
+        _srcset(derivatives["webp"]), sizes
+    )
+    return Markup("<picture>%s<img %s></picture>") % (source, Markup(_attr_string(attrs)))
+
+
+def _attr_string(attrs):
+    return " ".join(
+        f'{escape(name)}="{escape(value)}"'
+        for name, value in attrs.items()
+        if value is not None
+    )
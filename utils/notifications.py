@@ -0,0 +1,52 @@
+import os
+
+
+class TwilioSmsTransport:
+    """
+    Sends SMS through Twilio.
+    - One client per transport, so the worker reuses its HTTP connection
+    - Credentials / sender default to the TWILIO_* env vars
+    """
+
+    def __init__(self, account_sid=None, auth_token=None, from_number=None):
+        from twilio.rest import Client
+
+        self.client = Client(
+            account_sid or os.getenv("TWILIO_ACCOUNT_SID"),
+            auth_token or os.getenv("TWILIO_AUTH_TOKEN"),
+        )
+        self.from_number = from_number or os.getenv("TWILIO_FROM_NUMBER")
+
+    def send(self, to, body):
+        self.client.messages.create(body=body, from_=self.from_number, to=to)
+
+
+class FakeSmsTransport:
+    """
+    Keeps messages in memory instead of sending them (tests / local dev).
+    - `fail_times` makes the first N sends raise, to exercise retries
+    """
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+
+    def send(self, to, body):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError("fake transport failure")
+        self.sent.append({"to": to, "body": body})
+
+
+TRANSPORTS = {
+    "twilio": TwilioSmsTransport,
+    "fake": FakeSmsTransport,
+}
+
+
+def get_transport(name=None):
+    """Build the transport named by `name` or NOTIFICATION_TRANSPORT (default: twilio)."""
+    name = (name or os.getenv("NOTIFICATION_TRANSPORT", "twilio")).lower()
+    if name not in TRANSPORTS:
+        raise ValueError(f"Unknown notification transport: {name}")
+    return TRANSPORTS[name]()
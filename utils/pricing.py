@@ -0,0 +1,98 @@
+# Order pricing shared by the cart, checkout and order creation.
+# Cart lines are keyed "<product id>" or "<product id>:<variant id>.<variant id>"
+# so the same product in two colors is two lines. Everything here works on
+# already-loaded products/variants; the caller does the fetching.
+
+# Server-side wrap prices; the price the browser sends is never trusted
+WRAP_PRICES = {"jute": 30, "newspaper": 20, "pastel": 50, "golden": 60}
+
+
+def make_line_key(product_id, variant_ids=()):
+    variant_ids = sorted({int(v) for v in variant_ids})
+    if not variant_ids:
+        return str(product_id)
+    return f"{product_id}:{'.'.join(str(v) for v in variant_ids)}"
+
+
+def parse_line_key(key):
+    """(product_id, variant_ids) for a cart line key, or None if malformed."""
+    product_part, _, variant_part = str(key).partition(":")
+    if not product_part.isdigit():
+        return None
+    variant_ids = tuple(int(v) for v in variant_part.split(".") if v.isdigit())
+    return int(product_part), variant_ids
+
+
+def base_price(product):
+    """Sale price when set, otherwise the list price."""
+    return product.sale_price if product.sale_price else product.price
+
+
+def unit_price(product, variants):
+    return base_price(product) + sum(v.price_adjustment or 0 for v in variants)
+
+
+def line_name(product, variants):
+    if not variants:
+        return product.name
+    return f"{product.name} ({', '.join(v.name for v in variants)})"
+
+
+def quote(cart, products, variants, gift_wraps=None):
+    """
+    Price a cart.
+    - `cart` maps line keys to quantities; `products` / `variants` map ids to
+      loaded rows; lines whose product is gone are dropped
+    - A variant only applies to its own product, one per variant type
+    - `gift_wraps` maps line keys to {"type": ...}; unknown types are ignored
+    Returns {"lines", "subtotal", "wrap_total", "total", "count"}; each line
+    has key, product, variants, quantity, unit_price, line_total, name,
+    color, size, wrap and wrap_price.
+    """
+    gift_wraps = gift_wraps or {}
+    lines = []
+    subtotal = wrap_total = count = 0
+
+    for key, quantity in cart.items():
+        parsed = parse_line_key(key)
+        product = products.get(parsed[0]) if parsed else None
+        if product is None or quantity <= 0:
+            continue
+
+        chosen = {}
+        for variant_id in parsed[1]:
+            variant = variants.get(variant_id)
+            if variant is not None and variant.product_id == product.id:
+                chosen.setdefault(variant.variant_type, variant)
+        line_variants = list(chosen.values())
+
+        price = unit_price(product, line_variants)
+        wrap_type = (gift_wraps.get(key) or {}).get("type")
+        wrap_price = WRAP_PRICES.get(wrap_type)
+        if wrap_price is None:
+            wrap_type = None
+
+        lines.append({
+            "key": key,
+            "product": product,
+            "variants": line_variants,
+            "quantity": quantity,
+            "unit_price": price,
+            "line_total": price * quantity,
+            "name": line_name(product, line_variants),
+            "color": chosen["color"].name if "color" in chosen else None,
+            "size": chosen["size"].name if "size" in chosen else None,
+            "wrap": wrap_type,
+            "wrap_price": wrap_price or 0,
+        })
+        subtotal += price * quantity
+        wrap_total += wrap_price or 0
+        count += quantity
+
+    return {
+        "lines": lines,
+        "subtotal": subtotal,
+        "wrap_total": wrap_total,
+        "total": subtotal + wrap_total,
+        "count": count,
+    }
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import razorpay
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of calling the gateway while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Minimal consecutive-failure circuit breaker.
+    - Opens after `failure_threshold` failures in a row
+    - While open, calls fail fast for `reset_timeout` seconds
+    - Then lets one trial call through (half-open); success closes it again
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                raise CircuitOpenError("payment gateway circuit is open")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """Let another half-open trial through without counting this call either way."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class GatewaySession(requests.Session):
+    """
+    requests.Session with a keep-alive pool, default timeouts and a breaker.
+    - Connection errors, timeouts and 5xx responses count as failures
+    - So does any other Exception; KeyboardInterrupt / SystemExit only
+      release a half-open trial, so it never stays stuck
+    """
+
+    def __init__(self, timeout, breaker, pool_size=10):
+        super().__init__()
+        self.timeout = timeout
+        self.breaker = breaker
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        self.breaker.before_call()
+        try:
+            response = super().request(method, url, **kwargs)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # KeyboardInterrupt / SystemExit say nothing about the gateway
+            self.breaker.release_trial()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+
+def build_razorpay_client(key_id, key_secret, base_url=None, connect_timeout=3.05,
+                          read_timeout=10.0, pool_size=10, failure_threshold=5,
+                          reset_timeout=30.0):
+    """Razorpay client backed by a pooled, timeout-bounded GatewaySession."""
+    session = GatewaySession(
+        timeout=(connect_timeout, read_timeout),
+        breaker=CircuitBreaker(failure_threshold, reset_timeout),
+        pool_size=pool_size,
+    )
+    options = {"base_url": base_url.rstrip("/")} if base_url else {}
+    return razorpay.Client(session=session, auth=(key_id, key_secret), **options)
@@ -0,0 +1,88 @@
+import re
+
+# External-content FTS5 indexes over product text. The rows live in `product`;
+# the triggers below keep both indexes in step with every insert/update/delete,
+# whether it comes from the admin, a script or raw SQL.
+# - product_fts: name, description and category, for the /search page
+# - product_suggest_fts: name and category only, for typeahead; its doclists
+#   are much shorter, which keeps prefix lookups in the low milliseconds
+# prefix='2 3' adds prefix indexes so queries like "te"* avoid a term scan.
+FTS_TABLES = ("product_fts", "product_suggest_fts")
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+        name, description, category,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS product_suggest_fts USING fts5(
+        name, category,
+        content='product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ai AFTER INSERT ON product BEGIN
+        INSERT INTO product_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+        INSERT INTO product_suggest_fts(rowid, name, category)
+        VALUES (new.id, new.name, new.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_ad AFTER DELETE ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO product_suggest_fts(product_suggest_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS product_fts_au AFTER UPDATE OF name, description, category ON product BEGIN
+        INSERT INTO product_fts(product_fts, rowid, name, description, category)
+        VALUES ('delete', old.id, old.name, old.description, old.category);
+        INSERT INTO product_fts(rowid, name, description, category)
+        VALUES (new.id, new.name, new.description, new.category);
+        INSERT INTO product_suggest_fts(product_suggest_fts, rowid, name, category)
+        VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO product_suggest_fts(rowid, name, category)
+        VALUES (new.id, new.name, new.category);
+    END
+    """,
+]
+
+FTS_REBUILD = [f"INSERT INTO {table}({table}) VALUES ('rebuild')" for table in FTS_TABLES]
+
+# bm25() weights per column: name, description, category / name, category
+BM25_WEIGHTS = (10.0, 1.0, 4.0)
+SUGGEST_BM25_WEIGHTS = (10.0, 4.0)
+
+# Typeahead ranks at most this many matches, so a two-letter prefix that
+# hits half the catalog costs the same as a precise one
+SUGGEST_CANDIDATES = 500
+
+MAX_TERMS = 8
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(text, prefix=True):
+    """
+    Turn free text from a search box into a safe FTS5 MATCH expression.
+    - Every word is quoted, so FTS5 operators typed by users are just text
+    - Words are ANDed; with `prefix` the last word also matches as a prefix
+      ("teddy be" finds "Teddy Bear")
+    Returns None when there is nothing to search for.
+    """
+    terms = _TERM_RE.findall(text or "")[:MAX_TERMS]
+    if not terms:
+        return None
+
+    phrases = [f'"{term}"' for term in terms]
+    if prefix:
+        phrases[-1] += "*"
+    return " ".join(phrases)
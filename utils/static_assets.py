@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import gzip
+import shutil
+import hashlib
+
+try:
+    import brotli
+except ImportError:  # .br variants are simply not built
+    brotli = None
+
+# Build output lives under static/dist so it can be wiped and rebuilt
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+
+# Uploaded product images are content-addressed at upload time instead
+SKIP_DIRS = {DIST_DIR, "products", "uploads"}
+
+FINGERPRINT_LENGTH = 10
+COMPRESSIBLE_EXTENSIONS = {"css", "js", "mjs", "map", "json", "svg", "txt", "html", "xml", "ico"}
+MIN_COMPRESS_SIZE = 512
+
+# Content-Encoding name -> file suffix, in server preference order
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _fingerprinted_name(rel_path, file_hash):
+    stem, ext = os.path.splitext(rel_path)
+    return f"{DIST_DIR}/{stem}.{file_hash[:FINGERPRINT_LENGTH]}{ext}"
+
+
+def _compress(path, data):
+    """
+    Write .br/.gz siblings of `path`.
+    - A variant is only kept when it is actually smaller than the original
+    - Returns the Content-Encoding names that were written
+    """
+    written = []
+    for encoding, suffix in ENCODINGS:
+        if encoding == "br":
+            if brotli is None:
+                continue
+            packed = brotli.compress(data, quality=11)
+        else:
+            packed = gzip.compress(data, compresslevel=9, mtime=0)
+
+        if len(packed) < len(data):
+            with open(path + suffix, "wb") as fh:
+                fh.write(packed)
+            written.append(encoding)
+    return written
+
+
+def build_static_assets(static_root):
+    """
+    Fingerprint every static file and precompress text assets.
+    - images/logo.png is copied to dist/images/logo.<hash>.png
+    - Compressible files over MIN_COMPRESS_SIZE also get .br/.gz siblings
+    - dist/ is rebuilt from scratch and described by dist/manifest.json
+    Returns the manifest dict.
+    """
+    dist_root = os.path.join(static_root, DIST_DIR)
+    shutil.rmtree(dist_root, ignore_errors=True)
+
+    assets = {}
+    for dirpath, dirnames, filenames in os.walk(static_root):
+        rel_dir = os.path.relpath(dirpath, static_root).replace(os.sep, "/")
+        if rel_dir == ".":
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+            rel_dir = ""
+
+        for name in sorted(filenames):
+            if name.startswith("."):
+                continue
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            source = os.path.join(dirpath, name)
+            file_hash = _file_hash(source)
+            output = _fingerprinted_name(rel_path, file_hash)
+            target = os.path.join(static_root, *output.split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copy2(source, target)
+
+            encodings = []
+            ext = name.rsplit(".", 1)[-1].lower()
+            if ext in COMPRESSIBLE_EXTENSIONS and os.path.getsize(source) >= MIN_COMPRESS_SIZE:
+                with open(source, "rb") as fh:
+                    encodings = _compress(target, fh.read())
+
+            assets[rel_path] = {"path": output, "hash": file_hash, "encodings": encodings}
+
+    manifest = {"assets": assets}
+    os.makedirs(dist_root, exist_ok=True)
+    with open(os.path.join(dist_root, MANIFEST_NAME), "w") as fh:
+        json.dump(manifest, fh, indent=2, sort_keys=True)
+    return manifest
+
+
+class StaticManifest:
+    """
+    Lookup table written by build_static_assets().
+    - url_path() maps a source name to its fingerprinted URL path
+    - asset() recognises a fingerprinted path when it is requested
+    - Without a manifest (dev checkout, no build yet) names pass through unchanged
+    """
+
+    def __init__(self, static_root):
+        self.path = os.path.join(static_root, DIST_DIR, MANIFEST_NAME)
+        self.assets = {}
+        self.outputs = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as fh:
+                assets = json.load(fh).get("assets", {})
+        except (OSError, ValueError):
+            assets = {}
+        self.assets = assets
+        self.outputs = {entry["path"]: entry for entry in assets.values()}
+
+    def url_path(self, filename):
+        entry = self.assets.get(filename)
+        return entry["path"] if entry else filename
+
+    def asset(self, path):
+        return self.outputs.get(path)
+
+
+def pick_encoding(entry, accept_encodings):
+    """Best precompressed variant the client accepts, as (encoding, suffix) or None."""
+    for encoding, suffix in ENCODINGS:
+        if encoding in entry["encodings"] and accept_encodings[encoding]:
+            return encoding, suffix
+    return None
@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class WriteQueueFull(Exception):
+    """Raised instead of queueing when too many writes are already waiting."""
+
+
+class WriteTimeout(Exception):
+    """Raised when a queued write was not started within the caller's deadline."""
+
+
+class GroupCommitWriter:
+    """
+    Single background thread that applies writes on behalf of request threads.
+    - submit() queues a callable and blocks until its batch has committed
+    - The thread takes whatever is queued (up to `max_batch`) and hands it to
+      `run_batch`, which applies every job in one transaction; jobs that
+      arrive while a batch commits simply join the next one
+    - `max_delay` optionally holds a batch open a little longer to grow it
+    - At most `max_pending` jobs wait at once; beyond that submit() fails
+      fast with WriteQueueFull so callers can shed load
+    - A job still queued when its `timeout` expires is dropped and the caller
+      gets WriteTimeout; one that already started is always waited for
+
+    `run_batch(jobs)` must return one (ok, value_or_exception) pair per job.
+    The thread is started lazily, so it is created after a forking server
+    has forked its workers.
+    """
+
+    def __init__(self, run_batch, max_batch=32, max_delay=0.0, max_pending=256):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="group-commit-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, timeout=10.0):
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((fn, future))
+        except queue.Full:
+            raise WriteQueueFull("write queue is full")
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            if future.cancel():
+                raise WriteTimeout("write was not started in time")
+            # Already part of a batch; its outcome is only moments away
+            return future.result()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = [
+                (fn, future) for fn, future in self._next_batch()
+                if future.set_running_or_notify_cancel()
+            ]
+            if not batch:
+                continue
+
+            try:
+                results = self.run_batch([fn for fn, _ in batch])
+            except Exception as exc:
+                results = [(False, exc)] * len(batch)
+
+            for (_, future), (ok, value) in zip(batch, results):
+                if ok:
+                    future.set_result(value)
+                else:
+                    future.set_exception(value)
@@ -0,0 +1,32 @@
+"""
+Apply stored Razorpay webhook events from webhook_event.
+
+The webhook route only records events; run this alongside the web app:
+
+    python webhook_worker.py                 # poll every 2 seconds
+    python webhook_worker.py --once          # apply one batch and exit
+"""
+
+import argparse
+import time
+
+from app import app, process_webhook_events
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=2.0,
+                        help="seconds to sleep when no events are waiting")
+    parser.add_argument("--once", action="store_true")
+    args = parser.parse_args()
+
+    while True:
+        with app.app_context():
+            applied, failed = process_webhook_events(batch_size=args.batch_size)
+        if applied or failed:
+            print(f"✓ Applied {applied} webhook events, {failed} failed")
+        if args.once:
+            break
+        if applied + failed < args.batch_size:
+            time.sleep(args.interval)